@@ -28,6 +28,10 @@ from cat_agent.tools.simple_doc_parser import DocParserError
 from cat_agent.utils.utils import has_chinese_messages, merge_generate_cfgs
 
 
+# _detect_tool result for a message with neither a function call nor text; tuples are immutable, so it is shared
+_NO_TOOL_CALL = (False, None, None, '')
+
+
 class Agent(ABC):
     """A base class for Agent.
 
@@ -245,18 +249,12 @@ class Agent(ABC):
         Returns:
             Need to call tool or not, tool name, tool args, text replies.
         """
-        func_name = None
-        func_args = None
-
-        if message.function_call:
-            func_call = message.function_call
-            func_name = func_call.name
-            func_args = func_call.arguments
-        text = message.content
-        if not text:
-            text = ''
-
-        return (func_name is not None), func_name, func_args, text
+        func_call = message.function_call
+        text = message.content or ''
+        if not func_call:
+            return (False, None, None, text) if text else _NO_TOOL_CALL
+        func_name = func_call.name
+        return (func_name is not None), func_name, func_call.arguments, text
 
 
 # The most basic form of an agent is just a LLM, not augmented with any tool or workflow.
@@ -14,7 +14,6 @@
 
 import copy
 import datetime
-import json
 from typing import Dict, Iterator, List, Literal, Optional, Union
 
 from cat_agent.agents.fncall_agent import FnCallAgent
@@ -22,7 +21,7 @@ from cat_agent.llm import BaseChatModel
 from cat_agent.llm.schema import CONTENT, DEFAULT_SYSTEM_MESSAGE, ROLE, SYSTEM, ContentItem, Message
 from cat_agent.log import logger
 from cat_agent.tools import BaseTool
-from cat_agent.utils.utils import get_basename_from_url, print_traceback
+from cat_agent.utils.utils import get_basename_from_url, json_loads_strict, print_traceback
 
 KNOWLEDGE_TEMPLATE_ZH = """# Knowledge Base
 
@@ -50,31 +49,28 @@ KNOWLEDGE_SNIPPET = {'zh': KNOWLEDGE_SNIPPET_ZH, 'en': KNOWLEDGE_SNIPPET_EN}
 
 
 def format_knowledge_to_source_and_content(result: Union[str, List[dict]]) -> List[dict]:
-    knowledge = []
     if isinstance(result, str):
-        result = f'{result}'.strip()
+        result = result.strip()
         try:
-            docs = json.loads(result)
+            docs = json_loads_strict(result)
         except Exception:
             print_traceback()
-            knowledge.append({'source': 'Uploaded document', 'content': result})
-            return knowledge
+            return [{'source': 'Uploaded document', 'content': result}]
     else:
         docs = result
     try:
-        _tmp_knowledge = []
         assert isinstance(docs, list)
+        knowledge = []
         for doc in docs:
             url, snippets = doc['url'], doc['text']
             assert isinstance(snippets, list)
-            _tmp_knowledge.append({
+            knowledge.append({
                 'source': f'[file]({get_basename_from_url(url)})',
                 'content': '\n\n...\n\n'.join(snippets)
             })
-        knowledge.extend(_tmp_knowledge)
     except Exception:
         print_traceback()
-        knowledge.append({'source': 'Uploaded document', 'content': result})
+        knowledge = [{'source': 'Uploaded document', 'content': result}]
     return knowledge
 
 
@@ -86,14 +86,17 @@ class GroupChat(Agent, MultiAgentHub):
              mentioned_agents_name: List[str] = None,
              **kwargs) -> Iterator[List[Message]]:
 
-        messages = copy.deepcopy(messages)
+        # Only the name is filled in here, so unnamed messages get a shallow copy and the rest are shared
+        named_messages = []
         for message in messages:
             if message.role == 'assistant':
                 assert message.name, 'In group chat, each agent must be given a name'
             # Name will be used for router
             # Todo: Dealing with situations where there are no real players
             if not message.name:
-                message.name = message.role
+                message = message.model_copy(update={'name': message.role})
+            named_messages.append(message)
+        messages = named_messages
 
         if need_batch_response:
             return self._gen_batch_response(messages=messages,
@@ -115,7 +118,7 @@ class GroupChat(Agent, MultiAgentHub):
                             **kwargs) -> Iterator[List[Message]]:
         # Record all mentioned agents: reply in order
         mentioned_agents_name = mentioned_agents_name or []
-        messages = copy.deepcopy(messages)
+        messages = list(messages)  # Replies are appended below; the messages themselves are never mutated
 
         response = []
         for i in range(max_round):
@@ -13,7 +13,8 @@
 # limitations under the License.
 
 import copy
-from typing import Dict, Iterator, List, Optional, Union
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 from cat_agent import Agent
 from cat_agent.llm import BaseChatModel
@@ -55,12 +56,7 @@ Only return the role name from [{agent_names}] or '[STOP]'. Do not reply any oth
                  description: Optional[str] = None,
                  **kwargs):
         # This agent need prepend special system message according to inputted agents
-        agent_descs = '\n'.join([f'{x.name}: {x.description}' for x in agents])
-        lang = 'en'
-        if has_chinese_chars(agent_descs):
-            lang = 'zh'
-        system_prompt = self.PROMPT_TEMPLATE[lang].format(agent_descs=agent_descs,
-                                                          agent_names=', '.join([x.name for x in agents]))
+        system_prompt = self._build_system_prompt(tuple(x.name for x in agents), tuple(x.description for x in agents))
 
         super().__init__(function_list=function_list,
                          llm=llm,
@@ -69,8 +65,17 @@ Only return the role name from [{agent_names}] or '[STOP]'. Do not reply any oth
                          description=description,
                          **kwargs)
 
+    @classmethod
+    @lru_cache(maxsize=64)
+    def _build_system_prompt(cls, agent_names: Tuple[str, ...], agent_descs: Tuple[str, ...]) -> str:
+        # Cached per class and roster, so routers rebuilt for every request skip the formatting
+        descs = '\n'.join([f'{name}: {desc}' for name, desc in zip(agent_names, agent_descs)])
+        lang = 'zh' if has_chinese_chars(descs) else 'en'
+        return cls.PROMPT_TEMPLATE[lang].format(agent_descs=descs, agent_names=', '.join(agent_names))
+
     def _run(self, messages: List[Message], lang: str = 'en', **kwargs) -> Iterator[List[Message]]:
-        dialogue = [] # convert existing messages into a prompt
+        dialogue = []  # convert existing messages into a prompt, one line group per run of the same speaker
+        prev_name = None
         for msg in messages:
             if msg.role == SYSTEM:
                 continue
@@ -83,10 +88,11 @@ Only return the role name from [{agent_names}] or '[STOP]'. Do not reply any oth
             display_name = msg.role
             if msg.name:
                 display_name = msg.name
-            if dialogue and dialogue[-1].startswith(display_name):
-                dialogue[-1] += f'\n{content}'
+            if display_name == prev_name:
+                dialogue.append(content)
             else:
                 dialogue.append(f'{display_name}: {content}')
+                prev_name = display_name
 
         if not dialogue:
             dialogue.append('The conversation has just started, please choose any speaker, do not choose the real user')
@@ -153,22 +153,23 @@ def simulate_response_completion_with_chat(messages: List[Message]) -> List[Mess
         bot = messages[-1].content
         sep = '\n\n'
         if isinstance(usr, str) and isinstance(bot, str):
-            usr = usr + sep + bot
+            usr = f'{usr}{sep}{bot}'
         elif isinstance(usr, list) and isinstance(bot, list):
             usr = usr + [ContentItem(text=sep)] + bot
         else:
             raise NotImplementedError
-        text_to_complete = copy.deepcopy(messages[-2])
-        text_to_complete.content = usr
+        # The merged content is a new object either way, so a shallow copy leaves the caller's message untouched
+        text_to_complete = messages[-2].model_copy(update={'content': usr})
         messages = messages[:-2] + [text_to_complete]
     return messages
 
 
 def validate_num_fncall_results(messages: List[Message], support_multimodal_input: bool):
+    # Both runs are collected walking backwards from the end and reversed once, instead of prepending per message
     fn_results = []
     i = len(messages) - 1
     while messages[i].role == FUNCTION:
-        fn_results = [messages[i].name] + fn_results
+        fn_results.append(messages[i].name)
         content = messages[i].content
         if isinstance(content, list):
             for item in content:
@@ -180,8 +181,10 @@ def validate_num_fncall_results(messages: List[Message], support_multimodal_inpu
 
     fn_calls = []
     while messages[i].function_call:
-        fn_calls = [messages[i].function_call.name] + fn_calls
+        fn_calls.append(messages[i].function_call.name)
         i -= 1
+    fn_results.reverse()
+    fn_calls.reverse()
 
     if len(fn_calls) != len(fn_results):
         raise ValueError(f'Expecting {len(fn_calls)} function results (i.e., messages with role="function") '
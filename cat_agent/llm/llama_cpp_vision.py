@@ -8,7 +8,7 @@ from cat_agent.llm.base import register_llm
 from cat_agent.llm.function_calling import BaseFnCallModel
 from cat_agent.llm.schema import ASSISTANT, ContentItem, Message
 from cat_agent.log import logger
-from cat_agent.utils.utils import encode_image_as_base64
+from cat_agent.utils.utils import encode_image_as_base64, encode_many
 
 try:
     from llama_cpp import Llama
@@ -179,6 +179,8 @@ class LlamaCppVision(BaseFnCallModel):
         llama-cpp-python vision chat handlers.
         """
         result = []
+        # Image blocks whose URL is filled in afterwards, so local files are encoded together
+        pending_images = []
 
         for msg in messages:
             if isinstance(msg, Message):
@@ -198,15 +200,15 @@ class LlamaCppVision(BaseFnCallModel):
                         if t == 'text' and v:
                             new_content.append({'type': 'text', 'text': v})
                         elif t == 'image':
-                            url = self._resolve_image_value(v)
-                            new_content.append({'type': 'image_url', 'image_url': {'url': url}})
+                            new_content.append({'type': 'image_url', 'image_url': {'url': v}})
+                            pending_images.append(new_content[-1]['image_url'])
                         # Silently skip unsupported types (audio, video, file)
                     elif isinstance(item, dict):
                         if 'text' in item:
                             new_content.append({'type': 'text', 'text': item['text']})
                         elif 'image' in item:
-                            url = self._resolve_image_value(item['image'])
-                            new_content.append({'type': 'image_url', 'image_url': {'url': url}})
+                            new_content.append({'type': 'image_url', 'image_url': {'url': item['image']}})
+                            pending_images.append(new_content[-1]['image_url'])
                     else:
                         new_content.append({'type': 'text', 'text': str(item)})
 
@@ -216,6 +218,9 @@ class LlamaCppVision(BaseFnCallModel):
             else:
                 result.append({'role': role, 'content': str(content)})
 
+        urls = encode_many([image['url'] for image in pending_images], encode=self._resolve_image_value)
+        for image, url in zip(pending_images, urls):
+            image['url'] = url
         return result
 
     @staticmethod
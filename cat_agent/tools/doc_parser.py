@@ -12,46 +12,53 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
 import os
 import re
 import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Dict, List, Optional, Union
 
-from pydantic import BaseModel
-
 from cat_agent.log import logger
 from cat_agent.settings import DEFAULT_MAX_REF_TOKEN, DEFAULT_PARSER_PAGE_SIZE, DEFAULT_WORKSPACE
 from cat_agent.tools.base import BaseTool, register_tool
 from cat_agent.tools.simple_doc_parser import PARAGRAPH_SPLIT_SYMBOL, SimpleDocParser, get_plain_doc
 from cat_agent.tools.storage import KeyNotExistsError, Storage
 from cat_agent.utils.tokenization_qwen import count_tokens, tokenizer
-from cat_agent.utils.utils import get_basename_from_url, hash_sha256
+from cat_agent.utils.utils import get_basename_from_url, hash_sha256, json_dumps_compact, json_loads_strict
+
+# Parsed records kept in memory per DocParser, so warm hits skip the storage read and JSON decode
+_RECORD_CACHE_SIZE = 128
+
+_PAGE_MARK_RE = re.compile(r'\[page: \d+\]')
+_SENTENCE_SPLIT_RE = re.compile(r'\. |。')
 
 
-class Chunk(BaseModel):
+# Slotted dataclasses rather than pydantic models: parsing creates one Chunk per block of text,
+# and every field is already built by this module, so there is nothing to validate
+@dataclass(slots=True)
+class Chunk:
     content: str
     metadata: dict
     token: int
 
-    def __init__(self, content: str, metadata: dict, token: int):
-        super().__init__(content=content, metadata=metadata, token=token)
-
     def to_dict(self) -> dict:
-        return {'content': self.content, 'metadata': self.metadata, 'token': self.token}
+        return {'content': self.content, 'metadata': dict(self.metadata), 'token': self.token}
 
 
-class Record(BaseModel):
+@dataclass(slots=True)
+class Record:
     url: str
     raw: List[Chunk]
     title: str
 
-    def __init__(self, url: str, raw: List[Chunk], title: str):
-        super().__init__(url=url, raw=raw, title=title)
-
     def to_dict(self) -> dict:
         return {'url': self.url, 'raw': [x.to_dict() for x in self.raw], 'title': self.title}
 
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Record':
+        return cls(url=data['url'], raw=[Chunk(**x) for x in data['raw']], title=data['title'])
+
 
 @register_tool('doc_parser')
 class DocParser(BaseTool):
@@ -76,6 +83,7 @@ class DocParser(BaseTool):
         self.db = Storage({'storage_root_path': self.data_root})
 
         self.doc_extractor = SimpleDocParser({'structured_doc': True})
+        self._records: 'OrderedDict[str, Record]' = OrderedDict()
 
     def call(self, params: Union[str, dict], **kwargs) -> dict:
         """Extracting and blocking
@@ -97,18 +105,29 @@ class DocParser(BaseTool):
         """
 
         params = self._verify_json_format_args(params)
+        # The dict is built afresh on every call, so callers may edit it without touching the cached record
+        return self.load_record(params['url'], **kwargs).to_dict()
+
+    def load_record(self, url: str, **kwargs) -> Record:
+        """Parse and chunk ``url`` like ``call``, but return the cached ``Record`` itself.
+
+        The record is shared with later calls for the same document, so it must not be modified.
+        """
         # Compatible with the parameter passing of the qwen-agent version <= 0.0.3
         max_ref_token = kwargs.get('max_ref_token', self.max_ref_token)
         parser_page_size = kwargs.get('parser_page_size', self.parser_page_size)
 
-        url = params['url']
-
         cached_name_chunking = f'{hash_sha256(url)}_{str(parser_page_size)}'
+        record = self._records.get(cached_name_chunking)
+        if record is not None:
+            self._records.move_to_end(cached_name_chunking)
+            return record
+        lookup_name = cached_name_chunking
         try:
             # Directly load the chunked doc
-            record = self.db.get(cached_name_chunking)
-            record = json.loads(record)
+            record = Record.from_dict(json_loads_strict(self.db.get(cached_name_chunking)))
             logger.info(f'Read chunked {url} from cache.')
+            self._remember(lookup_name, record)
             return record
         except KeyNotExistsError:
             doc = self.doc_extractor.call({'url': url})
@@ -127,7 +146,7 @@ class DocParser(BaseTool):
         time1 = time.time()
         if total_token <= max_ref_token:
             # The whole doc is one chunk
-            content = [
+            chunks = [
                 Chunk(content=get_plain_doc(doc),
                       metadata={
                           'source': url,
@@ -138,16 +157,30 @@ class DocParser(BaseTool):
             ]
             cached_name_chunking = f'{hash_sha256(url)}_without_chunking'
         else:
-            content = self.split_doc_to_chunk(doc, url, title=title, parser_page_size=parser_page_size)
+            chunks = self.split_doc_to_chunk(doc, url, title=title, parser_page_size=parser_page_size)
 
         time2 = time.time()
         logger.info(f'Finished chunking {url} ({title}). Time spent: {time2 - time1} seconds.')
 
         # save the document data
-        new_record = Record(url=url, raw=content, title=title).to_dict()
-        new_record_str = json.dumps(new_record, ensure_ascii=False)
-        self.db.put(cached_name_chunking, new_record_str)
-        return new_record
+        record = Record(url=url, raw=chunks, title=title)
+        self._save(cached_name_chunking, lookup_name, record)
+        return record
+
+    def _save(self, name: str, lookup_name: str, record: Record) -> None:
+        # Drop the in-memory copy before writing, so a failed put cannot leave a stale record behind
+        self._records.pop(lookup_name, None)
+        self.db.put(name, json_dumps_compact(record.to_dict()))
+        # An unchunked record only fits the max_ref_token it was built for, and storage never serves it for
+        # lookup_name either, so it is not kept in memory
+        if name == lookup_name:
+            self._remember(lookup_name, record)
+
+    def _remember(self, name: str, record: Record) -> None:
+        """Keep a parsed record for later calls."""
+        self._records[name] = record
+        if len(self._records) > _RECORD_CACHE_SIZE:
+            self._records.popitem(last=False)
 
     def split_doc_to_chunk(self,
                            doc: List[dict],
@@ -178,7 +211,7 @@ class DocParser(BaseTool):
                 else:
                     if has_para:
                         # Record one chunk
-                        if isinstance(chunk[-1], str) and re.fullmatch(r'^\[page: \d+\]$', chunk[-1]) is not None:
+                        if isinstance(chunk[-1], str) and _PAGE_MARK_RE.fullmatch(chunk[-1]) is not None:
                             chunk.pop()  # Redundant page information
                         res.append(
                             Chunk(content=PARAGRAPH_SPLIT_SYMBOL.join(
@@ -203,7 +236,7 @@ class DocParser(BaseTool):
                     else:
                         # There are excessively long paragraphs present
                         # Split paragraph to sentences
-                        _sentences = re.split(r'\. |。', txt)
+                        _sentences = _SENTENCE_SPLIT_RE.split(txt)
                         sentences = []
                         for s in _sentences:
                             token = count_tokens(s)
@@ -234,8 +267,7 @@ class DocParser(BaseTool):
                                 sent_index += 1
                             else:
                                 assert has_para
-                                if isinstance(chunk[-1], str) and re.fullmatch(r'^\[page: \d+\]$',
-                                                                               chunk[-1]) is not None:
+                                if isinstance(chunk[-1], str) and _PAGE_MARK_RE.fullmatch(chunk[-1]) is not None:
                                     chunk.pop()  # Redundant page information
                                 res.append(
                                     Chunk(content=PARAGRAPH_SPLIT_SYMBOL.join(
@@ -259,7 +291,7 @@ class DocParser(BaseTool):
                         # Has split this paragraph by sentence
                         idx += 1
         if has_para:
-            if isinstance(chunk[-1], str) and re.fullmatch(r'^\[page: \d+\]$', chunk[-1]) is not None:
+            if isinstance(chunk[-1], str) and _PAGE_MARK_RE.fullmatch(chunk[-1]) is not None:
                 chunk.pop()  # Redundant page information
             res.append(
                 Chunk(content=PARAGRAPH_SPLIT_SYMBOL.join([x if isinstance(x, str) else x[0] for x in chunk]),
@@ -292,7 +324,7 @@ class DocParser(BaseTool):
             sentence_split_symbol = '. '
             if '。' in para:
                 sentence_split_symbol = '。'
-            sentences = re.split(r'\. |。', para)
+            sentences = _SENTENCE_SPLIT_RE.split(para)
             sentences = [sentence.strip() for sentence in sentences if sentence]
             for j in range(len(sentences) - 1, -1, -1):
                 sent = sentences[j]
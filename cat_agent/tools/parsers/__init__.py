@@ -8,6 +8,12 @@ Public API:
     DocParserError
 """
 
+import copy
+import importlib
+import os
+import threading
+from functools import lru_cache
+
 from cat_agent.tools.parsers.base import (  # noqa: F401
     DocParserError,
     PARAGRAPH_SPLIT_SYMBOL,
@@ -17,6 +23,38 @@ from cat_agent.tools.parsers.base import (  # noqa: F401
 
 PARSER_SUPPORTED_FILE_TYPES = ['pdf', 'docx', 'pptx', 'txt', 'html', 'csv', 'tsv', 'xlsx', 'xls']
 
+# Heavy third-party backends that the format parsers import lazily
+_PARSER_MODULES = (
+    'pdfminer.high_level',
+    'pdfminer.layout',
+    'pdfplumber',
+    'docx',
+    'pptx',
+    'bs4',
+    'polars',
+    'openpyxl',
+)
+_warmup_lock = threading.Lock()
+_warmup_started = False
+
+
+def _warm_parser_imports() -> None:
+    """Import all parser backends in a background thread, once per process."""
+    global _warmup_started
+    with _warmup_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+
+    def _import_all():
+        for name in _PARSER_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception:  # Optional dependency missing or broken; the parser will report it
+                pass
+
+    threading.Thread(target=_import_all, name='parser-import-warmup', daemon=True).start()
+
 
 def parse_document(path: str, extract_image: bool = False, file_type: str = None) -> list:
     """Dispatch to the appropriate parser based on file extension.
@@ -26,15 +64,33 @@ def parse_document(path: str, extract_image: bool = False, file_type: str = None
         extract_image: Whether to extract images (limited support).
         file_type: Optional pre-computed file type. If ``None``, detected automatically.
 
+    Results for local files are memoized on ``(path, mtime, size)`` so repeated
+    parses of an unchanged file are free; callers always receive a private copy.
+
     Returns the structured page list::
 
         [{'page_num': 1, 'content': [{'text': '...'}, {'table': '...'}]}, ...]
     """
+    _warm_parser_imports()
+
     if file_type is None:
         from cat_agent.utils.file_utils import get_file_type
         file_type = get_file_type(path)
 
-    f_type = file_type
+    try:
+        st = os.stat(path)
+    except OSError:
+        return _parse_document(path, extract_image, file_type)
+    doc = _parse_document_cached(os.path.abspath(path), st.st_mtime_ns, st.st_size, extract_image, file_type)
+    return copy.deepcopy(doc)
+
+
+@lru_cache(maxsize=128)
+def _parse_document_cached(abspath: str, mtime_ns: int, size: int, extract_image: bool, file_type: str) -> list:
+    return _parse_document(abspath, extract_image, file_type)
+
+
+def _parse_document(path: str, extract_image: bool, f_type: str) -> list:
 
     if f_type == 'pdf':
         from cat_agent.tools.parsers.pdf_parser import parse_pdf
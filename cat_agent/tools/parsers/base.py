@@ -1,11 +1,14 @@
 """Shared constants, errors and helpers used by all parsers."""
 
+from itertools import chain
 from typing import Optional
 
 from cat_agent.utils.str_processing import rm_cid, rm_continuous_placeholders, rm_hexadecimal
 
 PARAGRAPH_SPLIT_SYMBOL = '\n'
 
+_PLAIN_DOC_KEYS = ('text', 'table', 'image')
+
 
 class DocParserError(Exception):
 
@@ -32,10 +35,7 @@ def clean_paragraph(text: str) -> str:
 
 
 def get_plain_doc(doc: list) -> str:
-    paras = []
-    for page in doc:
-        for para in page['content']:
-            for k, v in para.items():
-                if k in ('text', 'table', 'image'):
-                    paras.append(v)
-    return PARAGRAPH_SPLIT_SYMBOL.join(paras)
+    # Each para carries exactly one of the content keys (plus metadata such as ``token``)
+    paras = chain.from_iterable(page['content'] for page in doc)
+    return PARAGRAPH_SPLIT_SYMBOL.join(
+        v for para in paras for k in _PLAIN_DOC_KEYS if (v := para.get(k)) is not None)
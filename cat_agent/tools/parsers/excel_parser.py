@@ -20,14 +20,23 @@ def df_to_md(df) -> str:
             return text
         return re.sub(r'-{6,}', '-----', text)
 
-    # Drop all-null columns and all-null rows
-    non_null_cols = [col for col in df.columns if df[col].null_count() < len(df)]
-    df = df.select(non_null_cols) if non_null_cols else df
-    df = df.filter(~pl.all_horizontal(pl.all().is_null()))
-
-    # Cast everything to string and fill nulls
-    df = df.cast({col: pl.Utf8 for col in df.columns})
-    df = df.fill_null('')
+    n = df.height
+    if n:
+        # Drop all-null columns and all-null rows (one null_count call for all columns)
+        null_counts = df.null_count().row(0)
+        non_null_cols = [col for col, nulls in zip(df.columns, null_counts) if nulls < n]
+        if not non_null_cols:
+            df = df.clear()
+        elif n == 1:
+            # The single row has a value in some kept column, so the row filter is a no-op
+            df = df.select(non_null_cols)
+        else:
+            df = df.select(non_null_cols)
+            df = df.filter(~pl.all_horizontal(pl.all().is_null()))
+
+        # Cast everything to string and fill nulls
+        df = df.cast({col: pl.Utf8 for col in df.columns})
+        df = df.fill_null('')
 
     headers = df.columns
     header_row = '| ' + ' | '.join(headers) + ' |'
@@ -1,6 +1,8 @@
 """PDF document parser using pdfminer + pdfplumber."""
 
+import io
 from collections import Counter
+from operator import itemgetter
 from typing import List
 
 from cat_agent.tools.parsers.base import clean_paragraph
@@ -11,37 +13,43 @@ def parse_pdf(pdf_path: str, extract_image: bool = False) -> List[dict]:
     from pdfminer.layout import LTImage, LTRect, LTTextContainer
     import pdfplumber
 
+    # Read the file once; both parsers get a BytesIO view sharing the same buffer
+    with open(pdf_path, 'rb') as f:
+        data = f.read()
+
     doc = []
-    pdf = pdfplumber.open(pdf_path)
-    for i, page_layout in enumerate(extract_pages(pdf_path)):
-        page = {'page_num': page_layout.pageid, 'content': []}
-        elements = list(page_layout)
-
-        table_num = 0
-        tables = []
-
-        for element in elements:
-            if isinstance(element, LTRect):
-                if not tables:
-                    tables = _extract_tables(pdf, i)
-                if table_num < len(tables):
-                    table_string = _table_to_string(tables[table_num])
-                    table_num += 1
-                    if table_string:
-                        page['content'].append({'table': table_string, 'obj': element})
-            elif isinstance(element, LTTextContainer):
-                text = element.get_text()
-                font = _get_font(element)
-                if text.strip():
-                    new_content_item = {'text': text, 'obj': element}
-                    if font:
-                        new_content_item['font-size'] = round(font[1])
-                    page['content'].append(new_content_item)
-            elif extract_image and isinstance(element, LTImage):
-                raise ValueError('Currently, extracting images is not supported!')
-
-        page['content'] = _postprocess_page_content(page['content'])
-        doc.append(page)
+    pdf = pdfplumber.open(io.BytesIO(data))
+    try:
+        for i, page_layout in enumerate(extract_pages(io.BytesIO(data))):
+            page = {'page_num': page_layout.pageid, 'content': []}
+            elements = list(page_layout)
+
+            # Extract the page's tables once, and only if the page has any rects at all
+            table_num = 0
+            tables = _extract_tables(pdf, i) if any(isinstance(e, LTRect) for e in elements) else []
+
+            for element in elements:
+                if isinstance(element, LTRect):
+                    if table_num < len(tables):
+                        table_string = _table_to_string(tables[table_num])
+                        table_num += 1
+                        if table_string:
+                            page['content'].append({'table': table_string, 'obj': element})
+                elif isinstance(element, LTTextContainer):
+                    text = element.get_text()
+                    font = _get_font(element)
+                    if text.strip():
+                        new_content_item = {'text': text, 'obj': element}
+                        if font:
+                            new_content_item['font-size'] = round(font[1])
+                        page['content'].append(new_content_item)
+                elif extract_image and isinstance(element, LTImage):
+                    raise ValueError('Currently, extracting images is not supported!')
+
+            page['content'] = _postprocess_page_content(page['content'])
+            doc.append(page)
+    finally:
+        pdf.close()
 
     return doc
 
@@ -101,7 +109,8 @@ def _get_font(element):
 
     if fonts_list:
         counter = Counter(fonts_list)
-        return counter.most_common(1)[0][0]
+        # Single linear scan; ties resolve to the first-seen font, as with most_common(1)
+        return max(counter.items(), key=itemgetter(1))[0]
     return []
 
 
@@ -1,12 +1,41 @@
 """Word (.docx) document parser."""
 
+import zipfile
 from typing import List
 
+from cat_agent.log import logger
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_BODY = f'{_W}body'
+_P = f'{_W}p'
+_R = f'{_W}r'
+_HYPERLINK = f'{_W}hyperlink'
+_TBL = f'{_W}tbl'
+_TR = f'{_W}tr'
+_TC = f'{_W}tc'
+_T = f'{_W}t'
+_BR = f'{_W}br'
+_VAL = f'{_W}val'
+_TYPE = f'{_W}type'
+
+# Text equivalents of run inner-content elements, mirroring python-docx
+_RUN_CHAR = {f'{_W}tab': '\t', f'{_W}ptab': '\t', f'{_W}cr': '\n', f'{_W}noBreakHyphen': '-'}
+
 
 def parse_word(docx_path: str, extract_image: bool = False) -> List[dict]:
     if extract_image:
         raise ValueError('Currently, extracting images is not supported!')
 
+    try:
+        content = _parse_word_xml(docx_path)
+    except Exception as ex:
+        logger.warning(f'Streaming docx parse failed, falling back to python-docx: {ex}')
+        content = _parse_word_docx(docx_path)
+
+    return [{'page_num': 1, 'content': content}]
+
+
+def _parse_word_docx(docx_path: str) -> List[dict]:
     from docx import Document
     doc = Document(docx_path)
 
@@ -19,5 +48,71 @@ def parse_word(docx_path: str, extract_image: bool = False) -> List[dict]:
             tbl.append('|' + '|'.join([cell.text for cell in row.cells]) + '|')
         tbl = '\n'.join(tbl)
         content.append({'table': tbl})
+    return content
 
-    return [{'page_num': 1, 'content': content}]
+
+def _parse_word_xml(docx_path: str) -> List[dict]:
+    """Single streaming pass over ``word/document.xml``, without the python-docx object model."""
+    from lxml import etree
+
+    paras, tables = [], []
+    with zipfile.ZipFile(docx_path) as z, z.open('word/document.xml') as f:
+        for _, el in etree.iterparse(f, events=('end',), tag=(_P, _TBL)):
+            parent = el.getparent()
+            if parent is None or parent.tag != _BODY:
+                continue  # Nested inside a table cell; handled with its top-level table
+            if el.tag == _P:
+                paras.append({'text': _paragraph_text(el)})
+            else:
+                tables.append({'table': '\n'.join('|' + '|'.join(row) + '|' for row in _table_rows(el))})
+            el.clear()
+            while el.getprevious() is not None:
+                del parent[0]
+    return paras + tables
+
+
+def _run_text(r) -> str:
+    parts = []
+    for child in r:
+        tag = child.tag
+        if tag == _T:
+            parts.append(child.text or '')
+        elif tag == _BR:
+            if child.get(_TYPE, 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        elif tag in _RUN_CHAR:
+            parts.append(_RUN_CHAR[tag])
+    return ''.join(parts)
+
+
+def _paragraph_text(p) -> str:
+    parts = []
+    for child in p:
+        if child.tag == _R:
+            parts.append(_run_text(child))
+        elif child.tag == _HYPERLINK:
+            parts.extend(_run_text(r) for r in child.iterchildren(_R))
+    return ''.join(parts)
+
+
+def _table_rows(tbl) -> List[List[str]]:
+    """Cell texts per row, repeating spanned cells the way python-docx ``row.cells`` does."""
+    rows = []
+    grid_text = {}  # Layout-grid offset -> text of the cell occupying it, for vertical merges
+    for tr in tbl.iterchildren(_TR):
+        grid_before = tr.find(f'{_W}trPr/{_W}gridBefore')
+        offset = int(grid_before.get(_VAL, 0)) if grid_before is not None else 0
+        cells = []
+        for tc in tr.iterchildren(_TC):
+            span_el = tc.find(f'{_W}tcPr/{_W}gridSpan')
+            span = int(span_el.get(_VAL, 1)) if span_el is not None else 1
+            vmerge = tc.find(f'{_W}tcPr/{_W}vMerge')
+            if vmerge is not None and vmerge.get(_VAL, 'continue') == 'continue':
+                text = grid_text.get(offset, '')
+            else:
+                text = '\n'.join(_paragraph_text(p) for p in tc.iterchildren(_P))
+            grid_text[offset] = text
+            cells.extend([text] * span)
+            offset += span
+        rows.append(cells)
+    return rows
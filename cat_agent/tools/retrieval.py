@@ -18,7 +18,7 @@ import json5
 
 from cat_agent.settings import DEFAULT_MAX_REF_TOKEN, DEFAULT_PARSER_PAGE_SIZE, DEFAULT_RAG_SEARCHERS
 from cat_agent.tools.base import TOOL_REGISTRY, BaseTool, register_tool
-from cat_agent.tools.doc_parser import DocParser, Record
+from cat_agent.tools.doc_parser import DocParser
 from cat_agent.tools.simple_doc_parser import PARSER_SUPPORTED_FILE_TYPES
 
 
@@ -97,13 +97,11 @@ class Retrieval(BaseTool):
         files = params.get('files', [])
         if isinstance(files, str):
             files = json5.loads(files)
-        records = []
-        for file in files:
-            _record = self.doc_parse.call(params={'url': file}, **kwargs)
-            records.append(_record)
+        # Cached Record objects are passed straight to the searcher instead of round-tripping through dicts
+        records = [self.doc_parse.load_record(file, **kwargs) for file in files]
 
         query = params.get('query', '')
         if records:
-            return self.search.call(params={'query': query}, docs=[Record(**rec) for rec in records], **kwargs)
+            return self.search.call(params={'query': query}, docs=records, **kwargs)
         else:
             return []
@@ -159,7 +159,7 @@ class BaseSearch(BaseTool):
 
             if isinstance(doc, Record):
                 new_docs.append(doc)
-                all_tokens += sum([page.token for page in doc.raw])
+                all_tokens += sum(page.token for page in doc.raw)
             else:
                 raise TypeError
         return new_docs, all_tokens
@@ -14,7 +14,8 @@
 
 import re
 import string
-from typing import List, Tuple
+from collections import defaultdict
+from typing import List, Optional, Tuple
 
 import json5
 
@@ -23,11 +24,48 @@ from cat_agent.settings import DEFAULT_MAX_REF_TOKEN
 from cat_agent.tools.base import register_tool
 from cat_agent.tools.doc_parser import Record
 from cat_agent.tools.search_tools.base_search import BaseSearch
-from cat_agent.utils.utils import has_chinese_chars
+from cat_agent.utils.utils import has_chinese_chars, json_loads_strict
+
+
+class _BM25Index:
+    """``BM25Okapi.get_scores`` over per-term postings, so each query term only touches the chunks containing it."""
+
+    def __init__(self, corpus: List[List[str]]):
+        import numpy as np
+        from rank_bm25 import BM25Okapi
+
+        bm25 = BM25Okapi(corpus)
+        self._size = bm25.corpus_size
+        self._idf = bm25.idf
+        self._k1 = bm25.k1
+        # The length-normalised part of the BM25 denominator, computed once per chunk
+        doc_len = np.array(bm25.doc_len)
+        self._norm = bm25.k1 * (1 - bm25.b + bm25.b * doc_len / (bm25.avgdl or 1))
+        postings = defaultdict(lambda: ([], []))
+        for i, freqs in enumerate(bm25.doc_freqs):
+            for term, freq in freqs.items():
+                ids, tfs = postings[term]
+                ids.append(i)
+                tfs.append(freq)
+        self._postings = {term: (np.array(ids), np.array(tfs)) for term, (ids, tfs) in postings.items()}
+
+    def get_scores(self, query: List[str]):
+        import numpy as np
+
+        score = np.zeros(self._size)
+        for q in query:
+            posting = self._postings.get(q)
+            if posting is None:
+                continue  # A term absent from every chunk adds zero
+            ids, q_freq = posting
+            score[ids] += (self._idf.get(q) or 0) * (q_freq * (self._k1 + 1) / (q_freq + self._norm[ids]))
+        return score
 
 
 @register_tool('keyword_search')
 class KeywordSearch(BaseSearch):
+    # Index of the last corpus searched, keyed by its chunk texts; repeated queries skip re-tokenizing it
+    _bm25_cache: Optional[Tuple[tuple, _BM25Index]] = None
 
     def search(self, query: str, docs: List[Record], max_ref_token: int = DEFAULT_MAX_REF_TOKEN) -> list:
         chunk_and_score = self.sort_by_scores(query=query, docs=docs)
@@ -54,9 +92,7 @@ class KeywordSearch(BaseSearch):
             all_chunks.extend(doc.raw)
 
         # Using bm25 retrieval
-        from rank_bm25 import BM25Okapi
-        bm25 = BM25Okapi([split_text_into_keywords(x.content) for x in all_chunks])
-        doc_scores = bm25.get_scores(wordlist)
+        doc_scores = self._bm25_index(all_chunks).get_scores(wordlist)
         chunk_and_score = [
             (chk.metadata['source'], chk.metadata['chunk_id'], score) for chk, score in zip(all_chunks, doc_scores)
         ]
@@ -65,6 +101,12 @@ class KeywordSearch(BaseSearch):
 
         return chunk_and_score
 
+    def _bm25_index(self, chunks: list) -> _BM25Index:
+        key = tuple(chk.content for chk in chunks)
+        if self._bm25_cache is None or self._bm25_cache[0] != key:
+            self._bm25_cache = (key, _BM25Index([split_text_into_keywords(content) for content in key]))
+        return self._bm25_cache[1]
+
 
 WORDS_TO_IGNORE = [
     'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', "you're", "you've", "you'll", "you'd", 'your',
@@ -91,38 +133,40 @@ CHINESE_PUNCTUATIONS = '。？！，、；：“”‘’（）《》【】…
 PUNCTUATIONS = ENGLISH_PUNCTUATIONS + CHINESE_PUNCTUATIONS
 
 
-def clean_en_token(token: str) -> str:
+# Tokens kept as they are: abbreviations (U.S.A.), e-mail addresses, percentages and runs of Chinese characters
+_SPECIAL_TOKEN_RE = re.compile(r'^(?:[A-Za-z]\.)+|\w+[@]\w+\.\w+|\d+%$|^(?:[\u4e00-\u9fff]+)$')
+
+_TOKEN_RE = re.compile(
+    r"""(?x)                    # Enable verbose mode, allowing regex to be on multiple lines and ignore whitespace
+                (?:[A-Za-z]\.)+          # Match abbreviations, e.g., U.S.A.
+                |\d+(?:\.\d+)?%?         # Match numbers, including percentages
+                |\w+(?:[-']\w+)*         # Match words, allowing for hyphens and apostrophes
+                |(?:[\w\-\']@)+\w+       # Match email addresses
+                """)
+
+_STOP_WORDS = frozenset(WORDS_TO_IGNORE)
+
 
-    punctuations_to_strip = PUNCTUATIONS
+def _is_all_punctuation(word: str) -> bool:
+    # Stripping punctuation from both ends empties the word exactly when every character is punctuation
+    return not word.strip(PUNCTUATIONS)
 
+
+def clean_en_token(token: str) -> str:
     # Detect if the token is a special case like U.S.A., E-mail, percentage, etc.
     # and skip further processing if that is the case.
-    special_cases_pattern = re.compile(r'^(?:[A-Za-z]\.)+|\w+[@]\w+\.\w+|\d+%$|^(?:[\u4e00-\u9fff]+)$')
-    if special_cases_pattern.match(token):
+    if _SPECIAL_TOKEN_RE.match(token):
         return token
 
     # Strip unwanted punctuations from front and end
-    token = token.strip(punctuations_to_strip)
-
-    return token
+    return token.strip(PUNCTUATIONS)
 
 
 def tokenize_and_filter(input_text: str) -> str:
-    patterns = r"""(?x)                    # Enable verbose mode, allowing regex to be on multiple lines and ignore whitespace
-                (?:[A-Za-z]\.)+          # Match abbreviations, e.g., U.S.A.
-                |\d+(?:\.\d+)?%?         # Match numbers, including percentages
-                |\w+(?:[-']\w+)*         # Match words, allowing for hyphens and apostrophes
-                |(?:[\w\-\']@)+\w+       # Match email addresses
-                """
-
-    tokens = re.findall(patterns, input_text)
-
-    stop_words = WORDS_TO_IGNORE
-
     filtered_tokens = []
-    for token in tokens:
+    for token in _TOKEN_RE.findall(input_text):
         token_lower = clean_en_token(token).lower()
-        if token_lower not in stop_words and not all(char in PUNCTUATIONS for char in token_lower):
+        if token_lower not in _STOP_WORDS and not _is_all_punctuation(token_lower):
             filtered_tokens.append(token_lower)
 
     return filtered_tokens
@@ -135,7 +179,7 @@ def string_tokenizer(text: str) -> List[str]:
         _wordlist_tmp = list(jieba.lcut(text))
         _wordlist = []
         for word in _wordlist_tmp:
-            if not all(char in PUNCTUATIONS for char in word):
+            if not _is_all_punctuation(word):
                 _wordlist.append(word)
     else:
         try:
@@ -145,7 +189,7 @@ def string_tokenizer(text: str) -> List[str]:
             _wordlist = text.split()
     _wordlist_res = []
     for word in _wordlist:
-        if word in WORDS_TO_IGNORE:
+        if word in _STOP_WORDS:
             continue
         else:
             _wordlist_res.append(word)
@@ -159,7 +203,7 @@ def split_text_into_keywords(text: str) -> List[str]:
     _wordlist = string_tokenizer(text)
     wordlist = []
     for x in _wordlist:
-        if x in WORDS_TO_IGNORE:
+        if x in _STOP_WORDS:
             continue
         wordlist.append(x)
     return wordlist
@@ -167,9 +211,12 @@ def split_text_into_keywords(text: str) -> List[str]:
 
 def parse_keyword(text):
     try:
-        res = json5.loads(text)
-    except Exception:
-        return split_text_into_keywords(text)
+        res = json_loads_strict(text)  # Keyword payloads are usually strict JSON; json5 only for the rest
+    except ValueError:
+        try:
+            res = json5.loads(text)
+        except Exception:
+            return split_text_into_keywords(text)
 
     import snowballstemmer
     stemmer = snowballstemmer.stemmer('english')
@@ -184,7 +231,7 @@ def parse_keyword(text):
         _wordlist = stemmer.stemWords(_wordlist)
         wordlist = []
         for x in _wordlist:
-            if x in WORDS_TO_IGNORE:
+            if x in _STOP_WORDS:
                 continue
             wordlist.append(x)
         split_wordlist = split_text_into_keywords(res['text'])
@@ -1,9 +1,15 @@
-from typing import List, Tuple, Optional, Dict
+from typing import Callable, List, Tuple, Optional, Dict
 
+import glob
+import hashlib
 import json
 import logging
 import os
+import pickle
 import shutil
+import sys
+from array import array
+from collections import OrderedDict
 
 from cat_agent.log import logger
 from cat_agent.settings import DEFAULT_WORKSPACE
@@ -11,6 +17,21 @@ from cat_agent.tools.base import register_tool
 from cat_agent.tools.doc_parser import Record
 from cat_agent.tools.search_tools.base_search import BaseSearch
 
+EMBEDDING_MODEL = 'BAAI/bge-base-en-v1.5'
+EMBEDDING_MODE = 'sentence-transformers'
+
+# Embeddings kept in memory per instance (~1.5 KB each at 768 dims in float16); older ones are re-read from disk
+_EMBEDDING_MEMORY_CACHE_SIZE = 20000
+
+
+def _result_extractor(probe) -> Callable[[object], Tuple[Optional[dict], Optional[float]]]:
+    """Return a ``result -> (metadata, score)`` accessor specialised for the shape of ``probe``."""
+    if isinstance(probe, dict):
+        return lambda r: (r.get('metadata') or r.get('meta'), r.get('score'))
+    if hasattr(probe, 'metadata'):
+        return lambda r: (r.metadata, getattr(r, 'score', None))
+    return lambda r: (getattr(r, 'meta', None), getattr(r, 'score', None))
+
 
 @register_tool('leann_search')
 class LeannSearch(BaseSearch):
@@ -18,13 +39,38 @@ class LeannSearch(BaseSearch):
         super().__init__(cfg)
         self.rebuild_rag: Optional[bool] = None
         self.leann_top_k: int = 100
+        # Drop hits scoring below this; None keeps every hit LEANN returns
+        self.leann_min_score: Optional[float] = None
+        # HNSW graph degree / build beam width, and the search beam width (efSearch)
+        self.hnsw_m: int = 16
+        self.hnsw_ef_construction: int = 100
+        self.hnsw_ef_search: int = 50
+        # Encoder batch size for the build pass; None keeps LEANN's per-device adaptive default
+        self.embed_batch_size: Optional[int] = None
+        # Reuse embeddings of unchanged chunks across rebuilds (keyed by content hash, persisted on disk;
+        # each successful build prunes the files of chunks that left the corpus, so vectors only carry over
+        # between builds of the same corpus).
+        # Vectors go through float16 whether fresh or cached, so builds agree with each other whatever the
+        # cache holds, but scores can differ from embed_cache=False by ~1e-3 (only near-ties may reorder)
+        self.embed_cache: bool = True
+        self._embedding_cache: 'OrderedDict[str, object]' = OrderedDict()
+        # The searcher loads the graph and passages on construction, so keep it across calls
+        self._searcher = None
+        self._searcher_index_path: Optional[str] = None
         if cfg is not None:
             self.rebuild_rag = cfg.get('rebuild_rag', None)
             self.leann_top_k = cfg.get('leann_top_k', self.leann_top_k)
+            self.leann_min_score = cfg.get('leann_min_score', self.leann_min_score)
+            self.hnsw_m = cfg.get('hnsw_m', self.hnsw_m)
+            self.hnsw_ef_construction = cfg.get('hnsw_ef_construction', self.hnsw_ef_construction)
+            self.hnsw_ef_search = cfg.get('hnsw_ef_search', self.hnsw_ef_search)
+            self.embed_batch_size = cfg.get('embed_batch_size', self.embed_batch_size)
+            self.embed_cache = cfg.get('embed_cache', self.embed_cache)
 
     def sort_by_scores(self, query: str, docs: List[Record], **kwargs) -> List[Tuple[str, int, float]]:
         try:
             from leann import LeannBuilder, LeannSearcher  # type: ignore
+            import numpy as np  # Always present alongside leann
         except ModuleNotFoundError as e:
             raise ModuleNotFoundError(
                 'LEANN is not installed. Please install it first, e.g.: `pip install leann`.\n'
@@ -36,72 +82,112 @@ class LeannSearch(BaseSearch):
         index_path, meta_path = self._index_paths()
         os.makedirs(os.path.dirname(index_path), exist_ok=True)
 
+        rebuild = bool(self.rebuild_rag)
+        corpus_hash = None
+        if rebuild:
+            corpus_hash = self._corpus_hash(docs)
+            if os.path.exists(f'{index_path}.meta.json') and self._load_corpus_hash(meta_path) == corpus_hash:
+                logger.info(f"[LeannSearch] Corpus unchanged since last build; skipping rebuild of {index_path}")
+                rebuild = False
 
-        if self.rebuild_rag:
+        if rebuild:
             logger.info(f"[LeannSearch] Building LEANN index at {index_path}")
+            # Drop the stale searcher first so its graph/model can be freed before the rebuild
+            self._searcher = None
+            self._searcher_index_path = None
+            # LEANN's sentence-transformers path already loads the encoder in FP16 (and calls .half() on
+            # CUDA/MPS) for both build and query embedding, so no precision override is needed here.
             builder = LeannBuilder(
                 backend_name="hnsw",
-                embedding_model = "BAAI/bge-base-en-v1.5",
-                embedding_mode = "sentence-transformers",
+                embedding_model=EMBEDDING_MODEL,
+                embedding_mode=EMBEDDING_MODE,
+                embedding_options=self._embedding_options(),
                 is_compact=True,
                 is_recompute=False,
+                M=self.hnsw_m,
+                efConstruction=self.hnsw_ef_construction,
             )
 
-            chunk_metadata = self._add_docs_to_builder(builder, docs)
+            chunk_urls, chunk_ids = self._collect_chunks_from_docs(docs)
+            texts = self._add_docs_to_builder(builder, docs)
             self._remove_existing_index(index_path)
 
-            builder.build_index(index_path)
+            self._build_index(builder, texts, index_path)
             logger.info(f"[LeannSearch] Built LEANN index at {index_path}")
 
-            self._save_metadata(meta_path, chunk_metadata)
+            self._save_metadata(meta_path, chunk_urls, chunk_ids, corpus_hash)
         else:
             logger.info(
                 f"[LeannSearch] Reusing existing LEANN index/storage at {index_path} (rebuild_rag={self.rebuild_rag})"
             )
-            chunk_metadata = self._load_metadata(meta_path)
+            chunk_urls, chunk_ids = self._load_metadata(meta_path)
 
-            if not chunk_metadata:
-                chunk_metadata = self._collect_chunks_from_docs(docs)
+            if not chunk_urls:
+                chunk_urls, chunk_ids = self._collect_chunks_from_docs(docs)
 
-        searcher = LeannSearcher(index_path)
-        print("[LeannSearch] Number of chunks available for search:", len(chunk_metadata))
-        if self.leann_top_k == 0:
+        print("[LeannSearch] Number of chunks available for search:", len(chunk_urls))
+        # Decide before opening the searcher, whose constructor loads the graph and embedding model
+        top_k = min(self.leann_top_k, len(chunk_urls))
+        if top_k <= 0:
             logger.info("[LeannSearch] No chunks available for search; returning empty result.")
             return []
 
-        logger.info(f"[LeannSearch] Running LEANN search for query={query!r}, top_k={self.leann_top_k}")
+        if self._searcher is None or self._searcher_index_path != index_path:
+            self._prefetch_index_file(index_path)
+            self._searcher = LeannSearcher(index_path)
+            self._searcher_index_path = index_path
+        searcher = self._searcher
+
+        logger.info(f"[LeannSearch] Running LEANN search for query={query!r}, top_k={top_k}")
         results = searcher.search(query,
-                                  top_k=self.leann_top_k,
-                                  complexity=32,
+                                  top_k=top_k,
+                                  complexity=self.hnsw_ef_search,
                                   beam_width=1,
                                   prune_ratio=0.0,
                                   recompute_embeddings=False,
                                   )
 
-        chunk_and_score: List[Tuple[str, int, float]] = []
+        urls: List[str] = []
+        chunk_ids: List[int] = []
+        scores: List[float] = []
+        # All results share one shape, so pick the field accessor once instead of probing per item
+        extract = _result_extractor(results[0]) if results else None
+        min_score = self.leann_min_score
         for result in results:
-            meta = getattr(result, 'metadata', None) or getattr(result, 'meta', None) or {}
+            meta, score = extract(result)
+            # Filter each hit on its own; the backend's result order is not relied on (sorted below)
+            if min_score is not None and float(score or 0.0) < min_score:
+                continue
             if not isinstance(meta, dict):
                 continue
 
             url = meta.get('url')
             chunk_id = meta.get('chunk_id')
-
-            score = getattr(result, 'score', None)
-            if score is None and isinstance(result, dict):
-                score = result.get('score', 0.0)
-
             if url is None or chunk_id is None:
                 continue
 
-            chunk_and_score.append((url, int(chunk_id), float(score or 0.0)))
+            score = float(score or 0.0)
+            urls.append(url)
+            chunk_ids.append(int(chunk_id))
+            scores.append(score)
+            for alias_url, alias_id in meta.get('aliases', ()):
+                urls.append(alias_url)
+                chunk_ids.append(int(alias_id))
+                scores.append(score)
 
-        chunk_and_score.sort(key=lambda x: x[2], reverse=True)
+        # Stable descending sort, matching list.sort(reverse=True) on ties
+        order = np.argsort(-np.asarray(scores, dtype=np.float64), kind='stable').tolist()
+        chunk_and_score: List[Tuple[str, int, float]] = [(urls[i], chunk_ids[i], scores[i]) for i in order]
 
         logger.info(f"[LeannSearch] Retrieved {len(chunk_and_score)} scored chunks from LEANN.")
         logger.info(f"[LeannSearch] Finished LEANN search using index at {index_path}")
         return chunk_and_score
 
+    def _embedding_options(self) -> Optional[Dict]:
+        if self.embed_batch_size:
+            return {'batch_size': self.embed_batch_size}
+        return None
+
     @staticmethod
     def _configure_logging() -> None:
         logging.getLogger("sentence_transformers").setLevel(logging.ERROR)
@@ -109,13 +195,46 @@ class LeannSearch(BaseSearch):
         logging.getLogger("leann_backend_hnsw").setLevel(logging.WARNING)
         logging.getLogger("leann_backend_hnsw.hnsw_backend").setLevel(logging.WARNING)
 
+    def _corpus_hash(self, docs: List[Record]) -> str:
+        """Fingerprint of the chunk texts and the build parameters that shape the index."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f'{self.hnsw_m}:{self.hnsw_ef_construction}'.encode())
+        for doc in docs:
+            h.update(b'\0' + doc.url.encode())
+            for page in doc.raw:
+                content = page.content.encode()
+                h.update(len(content).to_bytes(8, 'little') + content)
+        return h.hexdigest()
+
     @staticmethod
     def _index_paths() -> Tuple[str, str]:
         root = os.path.join(DEFAULT_WORKSPACE, 'storage', 'leann_indexes')
         index_path = os.path.join(root, 'rag_index.leann')
-        meta_path = os.path.join(root, 'rag_index.meta.json')
+        meta_path = os.path.join(root, 'rag_index.meta.pkl')
         return index_path, meta_path
 
+    @staticmethod
+    def _embedding_cache_dir() -> str:
+        model_dir = EMBEDDING_MODEL.replace('/', '--')
+        return os.path.join(DEFAULT_WORKSPACE, 'storage', 'leann_indexes', 'emb_cache', model_dir)
+
+    @staticmethod
+    def _prefetch_index_file(index_path: str) -> None:
+        """Ask the kernel to start paging in the HNSW graph, which the backend maps with mmap."""
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        graph_file = os.path.splitext(index_path)[0] + '.index'
+        try:
+            fd = os.open(graph_file, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
     @staticmethod
     def _remove_existing_index(index_path: str) -> None:
         if not os.path.exists(index_path):
@@ -133,49 +252,188 @@ class LeannSearch(BaseSearch):
             )
 
     @staticmethod
-    def _add_docs_to_builder(builder, docs: List[Record]) -> List[Tuple[str, int]]:
-        chunk_metadata: List[Tuple[str, int]] = []
+    def _remove_partial_index(index_path: str) -> None:
+        """Remove whatever a failed build left behind: the index path, its sidecar files and the graph file."""
+        LeannSearch._remove_existing_index(index_path)
+        leftovers = glob.glob(glob.escape(index_path) + '.*') + [os.path.splitext(index_path)[0] + '.index']
+        for path in leftovers:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _add_docs_to_builder(builder, docs: List[Record]) -> List[str]:
+        """Queue every chunk on the builder and return the texts in the order they were queued."""
+        # LEANN only queues texts here; the build step embeds the whole corpus in batched forward passes.
+        # Queue them shortest-first so each encoder batch holds similarly sized texts (minimal padding).
+        # Identical chunks are embedded once; the other locations ride along as aliases in the passage metadata.
+        locations: Dict[str, List[Tuple[str, int]]] = {}
         for doc in docs:
             for chunk_id, page in enumerate(doc.raw):
-                metadata = {'url': doc.url, 'chunk_id': chunk_id}
-                builder.add_text(page.content, metadata=metadata)
-                chunk_metadata.append((doc.url, chunk_id))
-        return chunk_metadata
+                locations.setdefault(page.content, []).append((doc.url, chunk_id))
+        texts = sorted(locations, key=len)
+        for text in texts:
+            (url, chunk_id), *aliases = locations[text]
+            metadata = {'url': url, 'chunk_id': chunk_id}
+            if aliases:
+                metadata['aliases'] = [[alias_url, alias_id] for alias_url, alias_id in aliases]
+            builder.add_text(text, metadata=metadata)
+        return texts
+
+    def _build_index(self, builder, texts: List[str], index_path: str) -> None:
+        if not self.embed_cache or not texts:
+            builder.build_index(index_path)
+            return
+        # Precomputed embeddings rely on LEANN internals; any mismatch falls back to a plain build
+        try:
+            from leann.embedding_compute import compute_embeddings  # type: ignore
+            embeddings = self._embed_with_cache(texts, compute_embeddings)
+            # LEANN assigns passage ids "0".."n-1" in add_text order
+            embeddings_file = f'{index_path}.embeddings.pkl'
+            with open(embeddings_file, 'wb') as f:
+                pickle.dump(([str(i) for i in range(len(texts))], embeddings), f, protocol=pickle.HIGHEST_PROTOCOL)
+            try:
+                builder.build_index_from_embeddings(index_path, embeddings_file)
+            finally:
+                os.remove(embeddings_file)
+        except Exception as e:
+            # The plain build works without those internals, so no failure on this path should abort the search
+            logger.warning(f"[LeannSearch] Cannot build from cached embeddings ({e!r}); embedding the full corpus.")
+            self._remove_partial_index(index_path)
+            builder.build_index(index_path)
+            return
+        self._prune_embedding_cache(texts)
+
+    @staticmethod
+    def _embedding_key(text: str) -> str:
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _embed_with_cache(self, texts: List[str], compute_embeddings):
+        import numpy as np
+
+        cache_dir = self._embedding_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        keys = [self._embedding_key(text) for text in texts]
+        found: Dict[str, object] = {}
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in missing:
+                continue
+            vector = self._embedding_cache.get(key)
+            if vector is None:
+                try:
+                    vector = np.load(os.path.join(cache_dir, f'{key}.npy'), allow_pickle=False)
+                except (OSError, ValueError):
+                    missing[key] = text
+                    continue
+            found[key] = vector
+
+        if missing:
+            logger.info(f"[LeannSearch] Embedding {len(missing)} new chunks ({len(texts)} total)")
+            vectors = compute_embeddings(list(missing.values()),
+                                         EMBEDDING_MODEL,
+                                         EMBEDDING_MODE,
+                                         is_build=True,
+                                         provider_options=self._embedding_options())
+            for key, vector in zip(missing, vectors):
+                # Round fresh vectors too, so a build gives the same index on a cold or a warm cache
+                vector = np.asarray(vector, dtype=np.float16)
+                found[key] = vector
+                try:
+                    np.save(os.path.join(cache_dir, f'{key}.npy'), vector, allow_pickle=False)
+                except OSError:
+                    logger.warning(f"[LeannSearch] Failed to cache embedding in {cache_dir}.")
+
+        for key, vector in found.items():
+            self._embedding_cache[key] = vector
+            self._embedding_cache.move_to_end(key)
+        while len(self._embedding_cache) > _EMBEDDING_MEMORY_CACHE_SIZE:
+            self._embedding_cache.popitem(last=False)
+
+        return np.stack([found[key] for key in keys]).astype(np.float32)
+
+    def _prune_embedding_cache(self, texts: List[str]) -> None:
+        """Delete cached embeddings of chunks that are no longer in the corpus just indexed.
+
+        The cache therefore only carries over between builds of the same (or a growing) corpus: building another
+        corpus in between drops the vectors of this one, and they are embedded again on the next build.
+        """
+        keep = {self._embedding_key(text) for text in texts}
+        cache_dir = self._embedding_cache_dir()
+        try:
+            names = os.listdir(cache_dir)
+        except OSError:
+            return
+        for name in names:
+            key, ext = os.path.splitext(name)
+            if ext == '.npy' and key not in keep:
+                self._embedding_cache.pop(key, None)
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
 
     @staticmethod
-    def _collect_chunks_from_docs(docs: List[Record]) -> List[Tuple[str, int]]:
-        chunk_metadata: List[Tuple[str, int]] = []
+    def _collect_chunks_from_docs(docs: List[Record]) -> Tuple[List[str], array]:
+        """Chunk metadata as parallel arrays: one interned url per chunk and a packed int array of chunk ids."""
+        chunk_urls: List[str] = []
+        chunk_ids = array('i')
         for doc in docs:
-            for chunk_id, _page in enumerate(doc.raw):
-                chunk_metadata.append((doc.url, chunk_id))
-        return chunk_metadata
+            url = sys.intern(doc.url)
+            n = len(doc.raw)
+            chunk_urls.extend([url] * n)
+            chunk_ids.extend(range(n))
+        return chunk_urls, chunk_ids
 
     @staticmethod
-    def _save_metadata(meta_path: str, chunk_metadata: List[Tuple[str, int]]) -> None:
+    def _save_metadata(meta_path: str,
+                       chunk_urls: List[str],
+                       chunk_ids: array,
+                       corpus_hash: Optional[str] = None) -> None:
+        data = {"urls": chunk_urls, "chunk_ids": chunk_ids, "corpus_hash": corpus_hash}
+        tmp_path = meta_path + ".tmp"
         try:
-            with open(meta_path, "w", encoding="utf-8") as f:
-                json.dump({"chunks": chunk_metadata}, f)
+            # Write aside and rename so a crash never leaves a truncated file behind
+            with open(tmp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, meta_path)
         except OSError:
             logger.warning(f"[LeannSearch] Failed to persist metadata to {meta_path}; reuse mode may be impaired.")
 
     @staticmethod
-    def _load_metadata(meta_path: str) -> List[Tuple[str, int]]:
-        if not os.path.exists(meta_path):
-            return []
-
+    def _read_metadata(meta_path: str) -> Optional[dict]:
+        """Load the metadata dict, falling back to the JSON file written by older versions."""
+        legacy_path = os.path.splitext(meta_path)[0] + '.json'
         try:
-            with open(meta_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except (OSError, ValueError, TypeError):
+            if os.path.exists(meta_path):
+                with open(meta_path, "rb") as f:
+                    data = pickle.load(f)
+            elif os.path.exists(legacy_path):
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            else:
+                return None
+            if isinstance(data, dict) and isinstance(data.get("chunks"), list):
+                # Older layout: a list of (url, chunk_id) pairs
+                pairs = data.pop("chunks")
+                data["urls"] = [sys.intern(entry[0]) for entry in pairs]
+                data["chunk_ids"] = array('i', (int(entry[1]) for entry in pairs))
+        except (OSError, ValueError, TypeError, IndexError, EOFError, pickle.UnpicklingError):
             logger.warning(f"[LeannSearch] Failed to load metadata from {meta_path}; falling back to docs.")
-            return []
+            return None
+        return data if isinstance(data, dict) else None
 
-        loaded = data.get("chunks", [])
-        if not isinstance(loaded, list):
-            return []
+    @staticmethod
+    def _load_metadata(meta_path: str) -> Tuple[List[str], array]:
+        data = LeannSearch._read_metadata(meta_path)
+        if not data or not isinstance(data.get("urls"), list):
+            return [], array('i')
+        chunk_ids = data.get("chunk_ids")
+        return data["urls"], chunk_ids if isinstance(chunk_ids, array) else array('i', chunk_ids or ())
 
-        chunk_metadata: List[Tuple[str, int]] = []
-        for entry in loaded:
-            if isinstance(entry, (list, tuple)) and len(entry) == 2:
-                chunk_metadata.append((entry[0], int(entry[1])))
-        return chunk_metadata
+    @staticmethod
+    def _load_corpus_hash(meta_path: str) -> Optional[str]:
+        data = LeannSearch._read_metadata(meta_path)
+        return data.get("corpus_hash") if data else None
@@ -28,10 +28,24 @@ from cat_agent.log import logger
 from cat_agent.settings import DEFAULT_WORKSPACE
 from cat_agent.tools.base import BaseTool, register_tool
 from cat_agent.tools.storage import KeyNotExistsError, Storage
-from cat_agent.utils.tokenization_qwen import count_tokens
+from cat_agent.utils.tokenization_qwen import count_tokens_batch
 from cat_agent.utils.file_utils import get_file_type, is_http_url, sanitize_chrome_file_path, save_url_to_local_work_dir
 from cat_agent.utils.misc import hash_sha256
 
+try:
+    import orjson
+
+    def _cache_dumps(obj) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+
+    _cache_loads = orjson.loads
+except ImportError:
+
+    def _cache_dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+    _cache_loads = json.loads
+
 # ---------------------------------------------------------------------------
 # Backward-compatible re-exports (other modules import these from here)
 # ---------------------------------------------------------------------------
@@ -53,6 +67,8 @@ from cat_agent.tools.parsers.txt_parser import parse_txt  # noqa: F401
 from cat_agent.tools.parsers.html_parser import parse_html_bs  # noqa: F401
 from cat_agent.tools.parsers.excel_parser import parse_excel, parse_csv, parse_tsv, df_to_md  # noqa: F401
 
+_WIN_DRIVE_RE = re.compile(r'^[A-Za-z]:[\\/]')
+
 
 @register_tool('simple_doc_parser')
 class SimpleDocParser(BaseTool):
@@ -86,7 +102,7 @@ class SimpleDocParser(BaseTool):
         cached_name_ori = f'{hash_sha256(path)}_ori'
 
         try:
-            parsed_file = json.loads(self.db.get(cached_name_ori))
+            parsed_file = _cache_loads(self.db.get(cached_name_ori))
             logger.info(f'Read parsed {path} from cache.')
         except KeyNotExistsError:
             logger.info(f'Start parsing {path}...')
@@ -108,13 +124,13 @@ class SimpleDocParser(BaseTool):
                 raise DocParserError(code=type(ex).__name__, message=str(ex))
 
             # Annotate token counts
-            for page in parsed_file:
-                for para in page['content']:
-                    para['token'] = count_tokens(para.get('text', para.get('table')))
+            paras = [para for page in parsed_file for para in page['content']]
+            for para, token in zip(paras, count_tokens_batch([para.get('text', para.get('table')) for para in paras])):
+                para['token'] = token
 
             time2 = time.time()
             logger.info(f'Finished parsing {path}. Time spent: {time2 - time1} seconds.')
-            self.db.put(cached_name_ori, json.dumps(parsed_file, ensure_ascii=False, indent=2))
+            self.db.put(cached_name_ori, _cache_dumps(parsed_file))
 
         if not self.structured_doc:
             return get_plain_doc(parsed_file)
@@ -125,8 +141,7 @@ class SimpleDocParser(BaseTool):
         """Normalise a user-supplied path (handle Chrome file:// URIs, Windows paths, etc.)."""
         f_type = get_file_type(path)
         if f_type in PARSER_SUPPORTED_FILE_TYPES:
-            if path.startswith('https://') or path.startswith('http://') or re.match(
-                    r'^[A-Za-z]:\\', path) or re.match(r'^[A-Za-z]:/', path):
+            if path.startswith(('https://', 'http://')) or _WIN_DRIVE_RE.match(path):
                 return path
             return sanitize_chrome_file_path(path)
         return path
@@ -1,6 +1,10 @@
+import atexit
+import bisect
+import contextlib
 import dbm
 import os
-from typing import Dict, Optional, Union
+import threading
+from typing import Dict, List, Optional, Union
 
 from cat_agent.settings import DEFAULT_WORKSPACE
 from cat_agent.tools.base import BaseTool, register_tool
@@ -15,10 +19,220 @@ def _norm_key(key: str) -> str:
     return key[1:] if key.startswith('/') else key
 
 
+# Write-behind limits: staged puts/deletes are written out once this many are pending, or this many seconds
+# after the first one was staged, whichever comes first
+_FLUSH_MAX_OPS = 1000
+_FLUSH_INTERVAL = 0.01
+
+
+# Upper bound on the LMDB memory map; address space only, the file grows with the data
+_LMDB_MAP_SIZE = 1 << 30
+
+
+class _LmdbDB:
+    """dbm-style mapping over an LMDB environment: reads come straight from the memory map."""
+
+    def __init__(self, db_path: str):
+        try:
+            import lmdb
+        except ImportError:
+            raise ValueError('Please install lmdb by `pip install "cat-agent[storage]"` to use the lmdb storage backend')
+        self._env = lmdb.open(db_path, map_size=_LMDB_MAP_SIZE, subdir=False)
+
+    def __contains__(self, kb: bytes) -> bool:
+        with self._env.begin() as txn:
+            return txn.get(kb) is not None
+
+    def __getitem__(self, kb: bytes) -> bytes:
+        with self._env.begin() as txn:
+            vb = txn.get(kb)
+        if vb is None:
+            raise KeyError(kb)
+        return vb
+
+    def keys(self) -> List[bytes]:
+        with self._env.begin() as txn:
+            return list(txn.cursor().iternext(keys=True, values=False))
+
+    def apply(self, changes: Dict[bytes, Optional[bytes]]) -> None:
+        """Write a batch of puts (and deletes, given as None) in one transaction."""
+        with self._env.begin(write=True) as txn:
+            for kb, vb in changes.items():
+                if vb is None:
+                    txn.delete(kb)
+                else:
+                    txn.put(kb, vb)
+
+    def sync(self) -> None:
+        self._env.sync()
+
+    def close(self) -> None:
+        self._env.close()
+
+
+class _BufferedDB:
+    """Puts and deletes for one database file, staged in memory and written (and synced) in batches.
+
+    Reads consult the staged writes first, so callers in this process always see their own writes. dbm files are
+    opened only for the duration of a read or a batch: dbm.dumb rewrites its key index from memory on close and
+    dbm.gnu locks the file while open, so a handle held across calls would drop or block other processes' writes.
+    """
+
+    def __init__(self, db_path: str):
+        self._path = db_path
+        # LMDB handles concurrent processes itself, so its environment stays open
+        self._lmdb = _LmdbDB(db_path) if db_path.endswith('.lmdb') else None
+        self._pending: Dict[bytes, Optional[bytes]] = {}  # None marks a staged delete
+        # Sorted live keys (stored plus staged), so prefix scans bisect instead of walking every key. Reloaded
+        # whenever the files on disk change, e.g. after a write by another process.
+        self._keys: List[bytes] = []
+        self._stamp: Optional[tuple] = None
+        self._refresh()
+
+    def _open(self):
+        return contextlib.nullcontext(self._lmdb) if self._lmdb is not None else dbm.open(self._path, 'c')
+
+    def _file_stamp(self) -> tuple:
+        # dbm backends derive their file names from the path with differing suffixes
+        stamp = []
+        for suffix in ('', '.db', '.dir', '.dat'):
+            try:
+                st = os.stat(self._path + suffix)
+            except OSError:
+                continue
+            stamp.append((suffix, st.st_mtime_ns, st.st_size))
+        return tuple(stamp)
+
+    def _load_keys(self, db) -> None:
+        keys = set(db.keys())
+        for kb, vb in self._pending.items():
+            if vb is None:
+                keys.discard(kb)
+            else:
+                keys.add(kb)
+        self._keys = sorted(keys)
+
+    def _refresh(self) -> None:
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            with self._open() as db:
+                self._load_keys(db)
+            self._stamp = self._file_stamp()
+
+    def __contains__(self, kb: bytes) -> bool:
+        self._refresh()
+        i = bisect.bisect_left(self._keys, kb)
+        return i < len(self._keys) and self._keys[i] == kb
+
+    def __getitem__(self, kb: bytes) -> bytes:
+        if kb in self._pending:
+            vb = self._pending[kb]
+            if vb is None:
+                raise KeyError(kb)
+            return vb
+        with self._open() as db:
+            return db[kb]
+
+    def get_many(self, kbs: List[bytes]) -> List[bytes]:
+        """Values for live keys ``kbs``, reading the database with a single open."""
+        with self._open() as db:
+            return [self._pending[kb] if kb in self._pending else db[kb] for kb in kbs]
+
+    def __setitem__(self, kb: bytes, vb: bytes) -> None:
+        self._stage(kb, vb)
+
+    def __delitem__(self, kb: bytes) -> None:
+        # Every live key is in the in-memory index, so this needs no probe of the underlying db
+        if kb not in self:
+            raise KeyError(kb)
+        self._stage(kb, None)
+
+    def keys(self) -> List[bytes]:
+        self._refresh()
+        return list(self._keys)
+
+    def keys_with_prefix(self, prefix: bytes) -> List[bytes]:
+        self._refresh()
+        start = bisect.bisect_left(self._keys, prefix)
+        end = start
+        while end < len(self._keys) and self._keys[end].startswith(prefix):
+            end += 1
+        return self._keys[start:end]
+
+    def _stage(self, kb: bytes, vb: Optional[bytes]) -> None:
+        i = bisect.bisect_left(self._keys, kb)
+        present = i < len(self._keys) and self._keys[i] == kb
+        if vb is None and present:
+            del self._keys[i]
+        elif vb is not None and not present:
+            self._keys.insert(i, kb)
+        if not self._pending:
+            timer = threading.Timer(_FLUSH_INTERVAL, self._timed_flush)
+            timer.daemon = True
+            timer.start()
+        self._pending[kb] = vb
+        if len(self._pending) >= _FLUSH_MAX_OPS:
+            self.flush()
+
+    def _timed_flush(self) -> None:
+        with _handles_lock:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        # Another process may have written since the key index was loaded; if so, reload it while the file is open
+        stale = self._file_stamp() != self._stamp
+        with self._open() as db:
+            if self._lmdb is not None:
+                db.apply(self._pending)
+            else:
+                for kb, vb in self._pending.items():
+                    if vb is None:
+                        if kb in db:
+                            del db[kb]
+                    else:
+                        db[kb] = vb
+            self._pending.clear()
+            # One sync per batch rather than one open/write/close per key
+            if hasattr(db, 'sync'):
+                db.sync()
+            if stale:
+                self._load_keys(db)
+        self._stamp = self._file_stamp()
+
+    def close(self) -> None:
+        self.flush()
+        if self._lmdb is not None:
+            self._lmdb.close()
+
+
+# One buffer per database file, shared by every Storage on that path, so all of them see the same staged writes
+_handles: Dict[str, _BufferedDB] = {}
+_handles_lock = threading.RLock()
+
+
+def _shared_db(db_path: str) -> _BufferedDB:
+    db = _handles.get(db_path)
+    if db is None:
+        db = _handles[db_path] = _BufferedDB(db_path)
+    return db
+
+
+@atexit.register
+def _close_all() -> None:
+    with _handles_lock:
+        for db in _handles.values():
+            db.close()
+        _handles.clear()
+
+
 @register_tool('storage')
 class Storage(BaseTool):
     """
-    This is a special tool for data storage (backed by stdlib dbm).
+    This is a special tool for data storage (backed by stdlib dbm, or LMDB with ``storage_backend='lmdb'``).
+
+    The LMDB backend needs the ``storage`` extra: ``pip install cat-agent[storage]``.
     """
     description = 'Tool for storing and reading data.'
     parameters = {
@@ -45,11 +259,13 @@ class Storage(BaseTool):
         super().__init__(cfg)
         root = self.cfg.get('storage_root_path', os.path.join(DEFAULT_WORKSPACE, 'tools', self.name))
         os.makedirs(root, exist_ok=True)
-        # dbm stores in a single file (e.g. storage.db); 'c' = create if missing
-        self._db_path = os.path.join(root, 'storage.db')
+        # dbm stores in a single file (e.g. storage.db); LMDB in storage.lmdb plus its lock file
+        self._db_name = 'storage.lmdb' if self.cfg.get('storage_backend', 'dbm') == 'lmdb' else 'storage.db'
+        self._db_path = os.path.join(root, self._db_name)
 
-    def _open_db(self, mode: str = 'c'):
-        return dbm.open(self._db_path, mode)
+    def _open_db(self, path: Optional[str] = None):
+        """The shared write buffer for this storage, or for the legacy ``path`` override; call under ``_handles_lock``."""
+        return _shared_db(self._db_path if path is None else os.path.join(path, self._db_name))
 
     def call(self, params: Union[str, dict], **kwargs) -> str:
         params = self._verify_json_format_args(params)
@@ -58,7 +274,8 @@ class Storage(BaseTool):
 
         if operate == 'put':
             assert 'value' in params
-            return self.put(key, params['value'])
+            # The agent is told the value was saved, so it must be on disk; write-behind is for internal caches
+            return self.put(key, params['value'], sync=True)
         elif operate == 'get':
             return self.get(key)
         elif operate == 'delete':
@@ -66,45 +283,55 @@ class Storage(BaseTool):
         else:
             return self.scan(key)
 
-    def put(self, key: str, value: str, path: Optional[str] = None) -> str:
+    def put(self, key: str, value: str, path: Optional[str] = None, sync: bool = False) -> str:
+        """Save ``value`` under ``key``; the write reaches disk with the next batch unless ``sync`` is set."""
         if path is not None:
             # Legacy: when path is passed, use that dir for the db (e.g. tests)
-            db_path = os.path.join(path, 'storage.db')
             os.makedirs(path, exist_ok=True)
-            with dbm.open(db_path, 'c') as db:
-                db[key.encode('utf-8')] = value.encode('utf-8')
-        else:
-            with self._open_db('c') as db:
-                db[key.encode('utf-8')] = value.encode('utf-8')
+        with _handles_lock:
+            db = self._open_db(path)
+            db[key.encode('utf-8')] = value.encode('utf-8')
+            if sync:
+                db.flush()
         return f'Successfully saved {key}.'
 
+    def flush(self, path: Optional[str] = None) -> None:
+        """Write any staged puts and deletes to disk."""
+        with _handles_lock:
+            self._open_db(path).flush()
+
     def get(self, key: str, path: Optional[str] = None) -> str:
-        db_path = self._db_path if path is None else os.path.join(path, 'storage.db')
-        with dbm.open(db_path, 'c') as db:
+        with _handles_lock:
+            db = self._open_db(path)
             kb = key.encode('utf-8')
-            if kb not in db:
+            try:
+                return db[kb].decode('utf-8')
+            except KeyError:
                 raise KeyNotExistsError(f'Get Failed: {key} does not exist')
-            return db[kb].decode('utf-8')
 
     def delete(self, key: str, path: Optional[str] = None) -> str:
-        db_path = self._db_path if path is None else os.path.join(path, 'storage.db')
-        with dbm.open(db_path, 'c') as db:
+        with _handles_lock:
+            db = self._open_db(path)
             kb = key.encode('utf-8')
-            if kb not in db:
+            try:
+                del db[kb]
+            except KeyError:
                 return f'Delete Failed: {key} does not exist'
-            del db[kb]
         return f'Successfully deleted {key}'
 
     def scan(self, key: str, path: Optional[str] = None) -> str:
-        db_path = self._db_path if path is None else os.path.join(path, 'storage.db')
         prefix = (key.rstrip('/') + '/') if key else ''
-        with dbm.open(db_path, 'c') as db:
+        with _handles_lock:
+            db = self._open_db(path)
             kvs = {}
-            for k in db.keys():
+            # Every match starts with the key minus trailing slashes, which is all the pre-filter may assume
+            for k in db.keys_with_prefix(key.rstrip('/').encode('utf-8')):
                 k_str = k.decode('utf-8')
                 if k_str == key or (prefix and k_str.startswith(prefix)):
                     rel = '/' + k_str[len(key):].lstrip('/') if key and k_str.startswith(key) else '/' + k_str
-                    kvs[rel] = db[k].decode('utf-8')
+                    kvs[rel] = k
             if not kvs:
                 return f'Scan Failed: {key} does not exist.'
-            return '\n'.join([f'{k}: {v}' for k, v in sorted(kvs.items())])
+            rels = sorted(kvs)
+            values = db.get_many([kvs[rel] for rel in rels])
+        return '\n'.join([f'{rel}: {vb.decode("utf-8")}' for rel, vb in zip(rels, values)])
@@ -12,6 +12,8 @@ Requirements:
 The WASI CPython binary and standard library are bundled under
 ``cat_agent/tools/resource/wasm_runtime/`` — no extra downloads needed.
 You can override the runtime directory via the ``runtime_dir`` config key.
+Set ``preload`` to compile (or load from wasmtime's cache) the module when the tool is
+created instead of on its first call.
 
 Limitations:
     - Only the Python **standard library** is available (no numpy/pandas/
@@ -22,15 +24,12 @@ Limitations:
 
 import glob
 import os
-import tempfile
 from pathlib import Path
 from typing import Dict, List, Optional, Union
 
-import json5
-
 from cat_agent.log import logger
 from cat_agent.tools.base import BaseTool, register_tool
-from cat_agent.utils.utils import extract_code, has_chinese_chars
+from cat_agent.utils.utils import extract_code, has_chinese_chars, json_loads
 
 # Default fuel budget — enough for most reasonable computations.
 # 400M fuel ≈ a few seconds of CPU work; raise for heavier tasks.
@@ -51,6 +50,8 @@ class WasmPythonRuntime:
         self.runtime_dir = runtime_dir
         self._engine = None
         self._module = None
+        # WASI imports resolve the same way for every run, so one linker serves all stores
+        self._linker = None
         self._wasm_path: Optional[str] = None
 
     def _find_wasm_binary(self) -> str:
@@ -88,6 +89,7 @@ class WasmPythonRuntime:
 
         self._engine = Engine(cfg)
 
+        # cfg.cache keeps compiled code in wasmtime's per-user cache, outside the sandbox
         logger.info('Compiling Python WASM module (cached after first load) ...')
         self._module = Module.from_file(self._engine, wasm_path)
 
@@ -104,8 +106,11 @@ class WasmPythonRuntime:
 
         engine, module = self._get_engine_and_module()
 
-        linker = Linker(engine)
-        linker.define_wasi()
+        if self._linker is None:
+            linker = Linker(engine)
+            linker.define_wasi()
+            self._linker = linker
+        linker = self._linker
 
         wasi_cfg = WasiConfig()
         wasi_cfg.argv = ('python', '-c', code)
@@ -113,45 +118,36 @@ class WasmPythonRuntime:
         # This gives CPython access to its stdlib but nothing else on the host.
         wasi_cfg.preopen_dir(self.runtime_dir, '/')
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            stdout_path = os.path.join(tmpdir, 'stdout.log')
-            stderr_path = os.path.join(tmpdir, 'stderr.log')
-            wasi_cfg.stdout_file = stdout_path
-            wasi_cfg.stderr_file = stderr_path
-
-            store = Store(engine)
-            store.set_fuel(fuel)
-            store.set_wasi(wasi_cfg)
-
-            instance = linker.instantiate(store, module)
-            start_fn = instance.exports(store)['_start']
-
-            error = None
-            try:
-                start_fn(store)
-            except Exception as exc:
-                error_msg = str(exc)
-                # Make the fuel-exhaustion message friendlier
-                if 'all fuel consumed' in error_msg:
-                    error = 'Timeout: Code execution exceeded the fuel (instruction) limit.'
-                else:
-                    error = error_msg
-
-            stdout = ''
-            stderr = ''
-            if os.path.isfile(stdout_path):
-                with open(stdout_path) as f:
-                    stdout = f.read()
-            if os.path.isfile(stderr_path):
-                with open(stderr_path) as f:
-                    stderr = f.read()
-
-            return {
-                'stdout': stdout.rstrip('\n'),
-                'stderr': stderr.rstrip('\n'),
-                'error': error,
-                'fuel_consumed': fuel - store.get_fuel(),
-            }
+        # Capture output in memory through WASI write callbacks instead of temp files
+        stdout = bytearray()
+        stderr = bytearray()
+        wasi_cfg.stdout_custom = stdout.extend
+        wasi_cfg.stderr_custom = stderr.extend
+
+        store = Store(engine)
+        store.set_fuel(fuel)
+        store.set_wasi(wasi_cfg)
+
+        instance = linker.instantiate(store, module)
+        start_fn = instance.exports(store)['_start']
+
+        error = None
+        try:
+            start_fn(store)
+        except Exception as exc:
+            error_msg = str(exc)
+            # Make the fuel-exhaustion message friendlier
+            if 'all fuel consumed' in error_msg:
+                error = 'Timeout: Code execution exceeded the fuel (instruction) limit.'
+            else:
+                error = error_msg
+
+        return {
+            'stdout': stdout.decode('utf-8', errors='replace').rstrip('\n'),
+            'stderr': stderr.decode('utf-8', errors='replace').rstrip('\n'),
+            'error': error,
+            'fuel_consumed': fuel - store.get_fuel(),
+        }
 
 
 # ---------------------------------------------------------------------------
@@ -191,6 +187,8 @@ class WasmCodeInterpreter(BaseTool):
         self.fuel: int = self.cfg.get('fuel', DEFAULT_FUEL)
         self._runtime: Optional[WasmPythonRuntime] = None
         _check_wasmtime_available()
+        if self.cfg.get('preload', False):
+            self._get_runtime()._get_engine_and_module()
 
     @property
     def args_format(self) -> str:
@@ -211,7 +209,7 @@ class WasmCodeInterpreter(BaseTool):
 
     def call(self, params: Union[str, dict], **kwargs) -> str:
         try:
-            params = json5.loads(params)
+            params = json_loads(params)
             code = params['code']
         except Exception:
             code = extract_code(params)
@@ -5,6 +5,7 @@ import re
 import shutil
 import time
 import urllib.parse
+from functools import lru_cache
 from typing import Literal
 
 import requests
@@ -12,14 +13,29 @@ import requests
 from cat_agent.log import logger
 from cat_agent.utils.misc import print_traceback
 
+_WIN_DRIVE_RE = re.compile(r'^[A-Za-z]:\\')
+_WIN_SLASH_RE = re.compile(r'^[A-Za-z]:/')
+_HTML_TAG_RE = re.compile(r'<(p|span|div|li|html|script)[^>]*?')
+_IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Shared session so repeated downloads reuse pooled (keep-alive) connections
+_SESSION = requests.Session()
+_SESSION.headers.update({
+    'User-Agent':
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+})
+_DOWNLOAD_CHUNK_SIZE = 1 << 20
+
 
 # ---------------------------------------------------------------------------
 # Basename / URL helpers
 # ---------------------------------------------------------------------------
 
 
+@lru_cache(maxsize=4096)
 def get_basename_from_url(path_or_url: str) -> str:
-    if re.match(r'^[A-Za-z]:\\', path_or_url):
+    if _WIN_DRIVE_RE.match(path_or_url):
         path_or_url = path_or_url.replace('\\', '/')
 
     basename = urllib.parse.urlparse(path_or_url).path
@@ -38,8 +54,7 @@ def is_http_url(path_or_url: str) -> bool:
 
 
 def is_image(path_or_url: str) -> bool:
-    filename = get_basename_from_url(path_or_url).lower()
-    return any(filename.endswith(ext) for ext in ('jpg', 'jpeg', 'png', 'webp'))
+    return get_basename_from_url(path_or_url).lower().endswith(_IMAGE_EXTS)
 
 
 # ---------------------------------------------------------------------------
@@ -70,7 +85,7 @@ def sanitize_windows_file_path(file_path: str) -> str:
     if os.path.exists(win_path):
         return win_path
 
-    if re.match(r'^[A-Za-z]:/', win_path):
+    if _WIN_SLASH_RE.match(win_path):
         wsl_path = f'/mnt/{win_path[0].lower()}/{win_path[3:]}'
         if os.path.exists(wsl_path):
             return wsl_path
@@ -99,17 +114,13 @@ def save_url_to_local_work_dir(url: str, save_dir: str, save_filename: str = '')
         url = sanitize_chrome_file_path(url)
         shutil.copy(url, new_path)
     else:
-        headers = {
-            'User-Agent':
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                '(KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-        }
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
+        # Stream to disk so memory stays bounded by one chunk whatever the file size
+        with _SESSION.get(url, stream=True, timeout=30) as response:
+            if response.status_code != 200:
+                raise ValueError('Can not download this file. Please check your network or the file link.')
             with open(new_path, 'wb') as file:
-                file.write(response.content)
-        else:
-            raise ValueError('Can not download this file. Please check your network or the file link.')
+                for chunk in response.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE):
+                    file.write(chunk)
     end_time = time.time()
     logger.info(f'Finished downloading {url} to {new_path}. Time spent: {end_time - start_time} seconds.')
     return new_path
@@ -142,9 +153,14 @@ def read_text_from_file(path: str) -> str:
 # ---------------------------------------------------------------------------
 
 
+def _sniff_head(path: str, n: int = 4096) -> str:
+    """The first ``n`` bytes of a file as text, enough to spot an HTML document without reading it all."""
+    with open(path, 'rb') as f:
+        return f.read(n).decode('utf-8', errors='replace')
+
+
 def contains_html_tags(text: str) -> bool:
-    pattern = r'<(p|span|div|li|html|script)[^>]*?'
-    return bool(re.search(pattern, text))
+    return bool(_HTML_TAG_RE.search(text))
 
 
 def get_content_type_by_head_request(path: str) -> str:
@@ -169,7 +185,7 @@ def get_file_type(path: str) -> Literal['pdf', 'docx', 'pptx', 'txt', 'html', 'c
         return 'html'
     else:
         try:
-            content = read_text_from_file(path)
+            content = _sniff_head(path)
         except Exception:
             print_traceback()
             return 'unk'
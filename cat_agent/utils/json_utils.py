@@ -2,19 +2,37 @@
 
 import json
 import re
-
 import json5
 from pydantic import BaseModel
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from cat_agent.utils.misc import print_traceback
 
+_LONG_DIGITS_RE = re.compile(r'\d{19}')
+_FENCE_RE = re.compile(r'```[^\n]*\n(.+?)```', re.DOTALL)
+
+
+def json_loads_strict(text: str):
+    """``json.loads`` semantics, decoded with orjson where that gives the same result."""
+    # orjson reads integers beyond 64 bits as floats, so leave anything with a long digit run to the stdlib
+    if orjson is not None and not _LONG_DIGITS_RE.search(text):
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass  # orjson is stricter (e.g. rejects NaN); let the stdlib decide
+    return json.loads(text)
+
 
 def json_loads(text: str) -> dict:
     text = text.strip('\n')
     if text.startswith('```') and text.endswith('\n```'):
         text = '\n'.join(text.split('\n')[1:-1])
     try:
-        return json.loads(text)
+        return json_loads_strict(text)
     except json.decoder.JSONDecodeError as json_err:
         try:
             return json5.loads(text)
@@ -30,17 +48,44 @@ class PydanticJSONEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+def _orjson_matches_stdlib(obj) -> bool:
+    """Whether ``obj`` holds only types orjson writes exactly like the stdlib: str-keyed dicts, lists, tuples,
+    strings, ints, bools and None. Floats differ (NaN becomes null, 1e16 loses its "+"), and orjson serialises
+    datetimes and dataclasses that the stdlib rejects."""
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            if not all(isinstance(k, str) for k in item):
+                return False
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif not (item is None or isinstance(item, (str, int))) or isinstance(item, float):
+            return False
+    return True
+
+
 def json_dumps_pretty(obj: dict, ensure_ascii=False, indent=2, **kwargs) -> str:
+    # orjson only supports indent=2 and the sort_keys option; everything else goes to the stdlib encoder
+    if (orjson is not None and indent == 2 and not ensure_ascii and set(kwargs) <= {'sort_keys'} and
+            _orjson_matches_stdlib(obj)):
+        option = orjson.OPT_INDENT_2 | (orjson.OPT_SORT_KEYS if kwargs.get('sort_keys') else 0)
+        try:
+            return orjson.dumps(obj, option=option).decode('utf-8')
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits; the stdlib encoder handles those
     return json.dumps(obj, ensure_ascii=ensure_ascii, indent=indent, cls=PydanticJSONEncoder, **kwargs)
 
 
 def json_dumps_compact(obj: dict, ensure_ascii=False, indent=None, **kwargs) -> str:
+    # Stays on the stdlib encoder: its output keys the LLM response cache, so the separators and NaN output are fixed
     return json.dumps(obj, ensure_ascii=ensure_ascii, indent=indent, cls=PydanticJSONEncoder, **kwargs)
 
 
 def extract_code(text: str) -> str:
     """Extract code from a markdown-fenced block or a JSON ``{"code": ...}`` wrapper."""
-    triple_match = re.search(r'```[^\n]*\n(.+?)```', text, re.DOTALL)
+    triple_match = _FENCE_RE.search(text)
     if triple_match:
         text = triple_match.group(1)
     else:
@@ -7,8 +7,18 @@ from typing import List, Literal, Tuple, Union
 from cat_agent.llm.schema import ASSISTANT, DEFAULT_SYSTEM_MESSAGE, FUNCTION, SYSTEM, USER, ContentItem, Message
 from cat_agent.log import logger
 from cat_agent.utils.file_utils import get_basename_from_url
+from cat_agent.utils.json_utils import json_dumps_pretty, json_loads_strict
 from cat_agent.utils.misc import has_chinese_chars
 
+_URL_RE = re.compile(r'https?://\S+')
+_MD_URL_RE = re.compile(r'!?\[[^\]]*\]\(([^\)]+)\)')
+
+# Markdown prefix of the upload-info tag per content kind; anything else is a [file]
+_UPLOAD_PREFIX = {'image': '![image]', 'video': '![video]', 'audio': '![audio]'}
+
+# Characters of message text gathered before each Chinese-character search in has_chinese_messages
+_CHINESE_SCAN_BATCH = 4096
+
 
 # ---------------------------------------------------------------------------
 # Message ↔ multimodal / text conversion
@@ -31,38 +41,37 @@ def format_as_multimodal_message(
         files = []
         for item in msg.content:
             k, v = item.get_type_and_value()
-            if k in ('text', 'image', 'audio', 'video'):
+            if k == 'text':
                 content.append(item)
-            if k == 'file':
+            elif k == 'file':
                 files.append((v, k))
-            if add_multimodel_upload_info and k in ('image', 'video'):
-                if isinstance(v, str):
-                    files.append((v, k))
-                elif isinstance(v, list):
-                    for _v in v:
-                        files.append((_v, k))
-                else:
-                    raise TypeError
-            if add_audio_upload_info and k == 'audio':
-                if isinstance(v, str):
-                    files.append((v, k))
-                elif isinstance(v, dict):
-                    files.append((v['data'], k))
-                else:
-                    raise TypeError
+            elif k in ('image', 'video'):
+                content.append(item)
+                if add_multimodel_upload_info:
+                    if isinstance(v, str):
+                        files.append((v, k))
+                    elif isinstance(v, list):
+                        files.extend((_v, k) for _v in v)
+                    else:
+                        raise TypeError
+            elif k == 'audio':
+                content.append(item)
+                if add_audio_upload_info:
+                    if isinstance(v, str):
+                        files.append((v, k))
+                    elif isinstance(v, dict):
+                        files.append((v['data'], k))
+                    else:
+                        raise TypeError
 
         if add_upload_info and files and (msg.role in (SYSTEM, USER)):
             if lang == 'auto':
-                has_zh = has_chinese_chars(msg)
+                has_zh = has_chinese_messages([msg], check_roles=(msg.role,))
             else:
                 has_zh = (lang == 'zh')
 
             # Build upload-info tags -- format is the same regardless of language
-            _kind_prefix = {'image': '![image]', 'video': '![video]', 'audio': '![audio]'}
-            upload = []
-            for f, k in [(get_basename_from_url(f), k) for f, k in files]:
-                prefix = _kind_prefix.get(k, '[file]')
-                upload.append(f'{prefix}({f})')
+            upload = [f'{_UPLOAD_PREFIX.get(k, "[file]")}({get_basename_from_url(f)})' for f, k in files]
 
             if upload:
                 upload_str = ' '.join(upload)
@@ -88,6 +97,10 @@ def format_as_multimodal_message(
     )
 
 
+def _collect_text(content: List[ContentItem]) -> str:
+    return ''.join(item.value for item in content if item.type == 'text')
+
+
 def format_as_text_message(
     msg: Message,
     add_upload_info: bool,
@@ -100,11 +113,7 @@ def format_as_text_message(
         add_audio_upload_info=add_upload_info,
         lang=lang,
     )
-    text = ''
-    for item in msg.content:
-        if item.type == 'text':
-            text += item.value
-    msg.content = text
+    msg.content = _collect_text(msg.content)
     return msg
 
 
@@ -119,6 +128,9 @@ def extract_text_from_message(
     lang: Literal['auto', 'en', 'zh'] = 'auto',
 ) -> str:
     if isinstance(msg.content, list):
+        if not add_upload_info:
+            # Without upload info the text is just the text items; skip rebuilding the message
+            return _collect_text(msg.content).strip()
         text = format_as_text_message(msg, add_upload_info=add_upload_info, lang=lang).content
     elif isinstance(msg.content, str):
         text = msg.content
@@ -128,33 +140,33 @@ def extract_text_from_message(
 
 
 def extract_files_from_messages(messages: List[Message], include_images: bool) -> List[str]:
-    files = []
+    files = {}  # Insertion-ordered set
     for msg in messages:
         if isinstance(msg.content, list):
             for item in msg.content:
-                if item.file and item.file not in files:
-                    files.append(item.file)
-                if include_images and item.image and item.image not in files:
-                    files.append(item.image)
-    return files
+                if item.file:
+                    files.setdefault(item.file)
+                if include_images and item.image:
+                    files.setdefault(item.image)
+    return list(files)
 
 
 def extract_images_from_messages(messages: List[Message]) -> List[str]:
-    files = []
+    files = {}  # Insertion-ordered set
     for msg in messages:
         if isinstance(msg.content, list):
             for item in msg.content:
-                if item.image and item.image not in files:
-                    files.append(item.image)
-    return files
+                if item.image:
+                    files.setdefault(item.image)
+    return list(files)
 
 
 def extract_urls(text: str) -> List[str]:
-    return re.findall(re.compile(r'https?://\S+'), text)
+    return _URL_RE.findall(text)
 
 
 def extract_markdown_urls(md_text: str) -> List[str]:
-    return re.findall(r'!?\[[^\]]*\]\(([^\)]+)\)', md_text)
+    return _MD_URL_RE.findall(md_text)
 
 
 # ---------------------------------------------------------------------------
@@ -163,38 +175,51 @@ def extract_markdown_urls(md_text: str) -> List[str]:
 
 
 def has_chinese_messages(messages: List[Union[Message, dict]], check_roles: Tuple[str] = (SYSTEM, USER)) -> bool:
+    batch, batch_len = [], 0
     for m in messages:
-        if m['role'] in check_roles:
-            if has_chinese_chars(m['content']):
+        is_dict = isinstance(m, dict)
+        if (m['role'] if is_dict else m.role) not in check_roles:
+            continue
+        content = m['content'] if is_dict else m.content
+        if isinstance(content, str):
+            texts = [content]
+        elif isinstance(content, list):
+            # Only the text items count; stringifying the whole list would also scan file paths and reprs
+            texts = [item.get('text') if isinstance(item, dict) else item.text for item in content]
+        else:
+            continue
+        for text in texts:
+            if text:
+                batch.append(text)
+                batch_len += len(text)
+        if batch_len >= _CHINESE_SCAN_BATCH:
+            if has_chinese_chars('\n'.join(batch)):
                 return True
-    return False
+            batch, batch_len = [], 0
+    return bool(batch) and has_chinese_chars('\n'.join(batch))
 
 
 def get_last_usr_msg_idx(messages: List[Union[dict, Message]]) -> int:
-    i = len(messages) - 1
-    while (i >= 0) and (messages[i]['role'] != 'user'):
-        i -= 1
-    assert i >= 0, messages
-    assert messages[i]['role'] == 'user'
-    return i
+    for i in range(len(messages) - 1, -1, -1):
+        m = messages[i]
+        if (m['role'] if isinstance(m, dict) else m.role) == USER:
+            return i
+    raise AssertionError(messages)
 
 
 def rm_default_system(messages: List[Message]) -> List[Message]:
-    if len(messages) > 1 and messages[0].role == SYSTEM:
-        if isinstance(messages[0].content, str):
-            if messages[0].content.strip() == DEFAULT_SYSTEM_MESSAGE:
-                return messages[1:]
-            else:
-                return messages
-        elif isinstance(messages[0].content, list):
-            if len(messages[0].content) == 1 and messages[0].content[0].text.strip() == DEFAULT_SYSTEM_MESSAGE:
-                return messages[1:]
-            else:
-                return messages
-        else:
-            raise TypeError
-    else:
+    if len(messages) < 2 or messages[0].role != SYSTEM:
         return messages
+    content = messages[0].content
+    if isinstance(content, str):
+        text = content
+    elif isinstance(content, list):
+        if len(content) != 1:
+            return messages
+        text = content[0].text
+    else:
+        raise TypeError
+    return messages[1:] if text.strip() == DEFAULT_SYSTEM_MESSAGE else messages
 
 
 # ---------------------------------------------------------------------------
@@ -216,12 +241,12 @@ def build_text_completion_prompt(
     if messages and messages[0].role == SYSTEM:
         sys = messages[0].content
         assert isinstance(sys, str)
-        prompt = f'{im_start}{SYSTEM}\n{sys}{im_end}'
+        parts = [f'{im_start}{SYSTEM}\n{sys}{im_end}']
         messages = messages[1:]
     elif default_system:
-        prompt = f'{im_start}{SYSTEM}\n{default_system}{im_end}'
+        parts = [f'{im_start}{SYSTEM}\n{default_system}{im_end}']
     else:
-        prompt = ''
+        parts = []
 
     if messages[-1].role != ASSISTANT:
         messages = messages + [Message(ASSISTANT, '')]
@@ -235,8 +260,8 @@ def build_text_completion_prompt(
                 assert msg.role == ASSISTANT
                 tool_call = msg.function_call.arguments
                 try:
-                    tool_call = {'name': msg.function_call.name, 'arguments': json.loads(tool_call)}
-                    tool_call = json.dumps(tool_call, ensure_ascii=False, indent=2)
+                    tool_call = {'name': msg.function_call.name, 'arguments': json_loads_strict(tool_call)}
+                    tool_call = json_dumps_pretty(tool_call)
                 except json.decoder.JSONDecodeError:
                     tool_call = '{"name": "' + msg.function_call.name + '", "arguments": ' + tool_call + '}'
                 if content:
@@ -245,10 +270,9 @@ def build_text_completion_prompt(
         else:
             assert msg.role in (USER, ASSISTANT)
             assert msg.function_call is None
-        if prompt:
-            prompt += '\n'
-        prompt += f'{im_start}{msg.role}\n{content}{im_end}'
+        parts.append(f'{im_start}{msg.role}\n{content}{im_end}')
 
+    prompt = '\n'.join(parts)
     assert prompt.endswith(im_end)
     prompt = prompt[:-len(im_end)]
     return prompt
@@ -1,12 +1,12 @@
 """Miscellaneous low-level utilities with no internal dependencies (except logger)."""
 
-import copy
 import hashlib
 import re
 import signal
 import socket
 import sys
 import traceback
+from functools import lru_cache
 from typing import Any, Optional
 
 from cat_agent.log import logger
@@ -46,7 +46,9 @@ def append_signal_handler(sig, handler):
 # ---------------------------------------------------------------------------
 
 
+@lru_cache(maxsize=1)
 def get_local_ip() -> str:
+    """The address of the outbound interface, resolved once per process (``get_local_ip.cache_clear()`` refreshes it)."""
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
         s.connect(('10.255.255.255', 1))
@@ -72,12 +74,17 @@ def hash_sha256(text: str) -> str:
 # ---------------------------------------------------------------------------
 
 
+def _format_traceback() -> str:
+    return ''.join(traceback.format_exception(*sys.exc_info(), limit=3))
+
+
 def print_traceback(is_error: bool = True):
-    tb = ''.join(traceback.format_exception(*sys.exc_info(), limit=3))
+    # Lazy, so the frames are only walked and formatted when a sink will emit the record
+    lazy_logger = logger.opt(lazy=True)
     if is_error:
-        logger.error(tb)
+        lazy_logger.error('{}', _format_traceback)
     else:
-        logger.warning(tb)
+        lazy_logger.warning('{}', _format_traceback)
 
 
 # ---------------------------------------------------------------------------
@@ -87,8 +94,37 @@ def print_traceback(is_error: bool = True):
 CHINESE_CHAR_RE = re.compile(r'[\u4e00-\u9fff]')
 
 
+# Above this length, a vectorised NumPy range test beats the regex scan when no match comes early.
+# The text is scanned in windows so that a hit (the usual case for Chinese text) ends the scan.
+_NUMPY_SCAN_MIN_LEN = 4096
+_NUMPY_SCAN_WINDOW = 16384
+
+
 def has_chinese_chars(data: Any) -> bool:
-    text = f'{data}'
+    if isinstance(data, str):
+        text = data
+    elif isinstance(data, (list, tuple)):
+        # Check the items one by one rather than building the repr of the whole container
+        return any(has_chinese_chars(item) for item in data)
+    elif isinstance(data, dict):
+        return any(has_chinese_chars(k) or has_chinese_chars(v) for k, v in data.items())
+    else:
+        text = f'{data}'
+    if len(text) > _NUMPY_SCAN_MIN_LEN:
+        try:
+            import numpy as np
+        except ImportError:
+            pass
+        else:
+            # The regex is cheapest for a hit near the start; NumPy takes the rest a window at a time
+            if CHINESE_CHAR_RE.search(text, 0, _NUMPY_SCAN_MIN_LEN):
+                return True
+            for start in range(_NUMPY_SCAN_MIN_LEN, len(text), _NUMPY_SCAN_WINDOW):
+                window = text[start:start + _NUMPY_SCAN_WINDOW].encode('utf-32-le', errors='surrogatepass')
+                codes = np.frombuffer(window, dtype='<u4')
+                if ((codes >= 0x4E00) & (codes <= 0x9FFF)).any():
+                    return True
+            return False
     return bool(CHINESE_CHAR_RE.search(text))
 
 
@@ -98,7 +134,11 @@ def has_chinese_chars(data: Any) -> bool:
 
 
 def merge_generate_cfgs(base_generate_cfg: Optional[dict], new_generate_cfg: Optional[dict]) -> dict:
-    generate_cfg: dict = copy.deepcopy(base_generate_cfg or {})
+    # Generation configs are flat; only the stop list is ever mutated in place, so copy that alone.
+    # Callers must not mutate other nested values of the merged config.
+    generate_cfg: dict = dict(base_generate_cfg) if base_generate_cfg else {}
+    if 'stop' in generate_cfg:
+        generate_cfg['stop'] = list(generate_cfg['stop'])
     if new_generate_cfg:
         for k, v in new_generate_cfg.items():
             if k == 'stop':
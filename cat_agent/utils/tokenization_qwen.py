@@ -218,6 +218,16 @@ class QWenTokenizer:
     def count_tokens(self, text: str) -> int:
         return len(self.tokenize(text))
 
+    def count_tokens_batch(self, texts: List[str], num_threads: int = 8) -> List[int]:
+        """
+        Token counts for many texts, encoded in one tiktoken batch call across threads.
+        """
+        batch = self.tokenizer.encode_batch([unicodedata.normalize('NFC', t) for t in texts],
+                                            num_threads=num_threads,
+                                            allowed_special='all',
+                                            disallowed_special=())
+        return [len(ids) for ids in batch]
+
     def truncate(self, text: str, max_token: int, start_token: int = 0, keep_both_sides: bool = False) -> str:
         token_list = self.tokenize(text)[start_token:]
         if len(token_list) <= max_token:
@@ -244,3 +254,7 @@ tokenizer = QWenTokenizer(Path(__file__).resolve().parent / 'qwen.tiktoken')
 
 def count_tokens(text: str) -> int:
     return tokenizer.count_tokens(text)
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    return tokenizer.count_tokens_batch(texts)
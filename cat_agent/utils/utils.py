@@ -28,6 +28,7 @@ from cat_agent.utils.json_utils import (  # noqa: F401
     json_dumps_compact,
     json_dumps_pretty,
     json_loads,
+    json_loads_strict,
 )
 
 from cat_agent.utils.file_utils import (  # noqa: F401
@@ -47,6 +48,7 @@ from cat_agent.utils.file_utils import (  # noqa: F401
 from cat_agent.utils.media_utils import (  # noqa: F401
     encode_audio_as_base64,
     encode_image_as_base64,
+    encode_many,
     encode_video_as_base64,
     load_image_from_base64,
     resize_image,
@@ -1,7 +1,7 @@
+import os
 from pathlib import Path
 from cat_agent.llm.schema import Message, USER
 from cat_agent.memory import Memory
-import torch
 
 def main():
     examples_dir = Path(__file__).parent
@@ -13,24 +13,29 @@ def main():
             encoding="utf-8",
         )
 
+    # Q4_K_M GGUF under llama.cpp: a fraction of the FP16 weights' memory, and fast on CPU
     llm_cfg = {
-        'model': 'Qwen/Qwen3-1.7B',
-        'model_type': 'transformers',
-        'device': 'cuda:0' if torch.cuda.is_available() else 'mps',
+        'model_type': 'llama_cpp',
+        'repo_id': 'unsloth/Qwen3-1.7B-GGUF',
+        'filename': 'Qwen3-1.7B-Q4_K_M.gguf',
+        'n_ctx': 512,
+        'n_gpu_layers': -1,
+        'n_threads': max(1, (os.cpu_count() or 2) // 2),
         'generate_cfg': {
-            'max_input_tokens': 512,
-            'max_new_tokens': 128,
+            'max_input_tokens': 384,  # Leaves room for the answer within n_ctx
+            'max_tokens': 128,
             'temperature': 0.3,
             'top_p': 0.8,
-            'repetition_penalty': 1.2,
         },
     }
 
     # RAG configuration: explicitly enable LEANN and ensure its searcher is used.
+    # With rebuild_rag on, the index is rebuilt only when the document's chunks change (the corpus
+    # hash is stored next to the index), so repeated runs reuse it without re-embedding.
     rag_cfg = {
         "enable_leann": True,
         "rag_searchers": ["leann_search"],
-        "rebuild_rag": False,
+        "rebuild_rag": True,
     }
     mem = Memory(llm=llm_cfg, files=[str(doc_path)], rag_cfg=rag_cfg)
 
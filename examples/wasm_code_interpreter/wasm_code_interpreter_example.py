@@ -44,7 +44,8 @@ def main():
             'available (json, math, re, sqlite3, itertools, collections, '
             'datetime, etc.).'
         ),
-        function_list=["wasm_code_interpreter"],
+        # Compile the CPython module (or load it from wasmtime's code cache) now rather than on the first tool call
+        function_list=[{'name': 'wasm_code_interpreter', 'preload': True}],
     )
 
     # -----------------------------------------------------------------
@@ -62,23 +63,33 @@ def main():
         messages = [{'role': 'user', 'content': prompt}]
 
         response = []
+        printed_msgs = 0  # Messages before this index have been fully printed
+        printed_len = 0   # Characters of the current assistant message already printed
         st = time.time()
         for response in bot.run(messages=messages):
-            # Print each step so we can see tool calls and results
-            last = response[-1]
-            role = last.get('role', '')
-            if role == 'function':
-                print(f'\n[TOOL RESULT] {last.get("name", "")}:')
-                print(last.get('content', '')[:500])
-            elif role == 'assistant' and last.get('function_call'):
-                fc = last['function_call']
-                print(f'\n[TOOL CALL] {fc.get("name", "")}')
-
-        # Print final response
-        if response:
-            final = response[-1]
-            if final.get('role') == 'assistant' and not final.get('function_call'):
-                print(f'\nASSISTANT:\n{final.get("content", "")}')
+            # Each yield is the whole response so far; print only what is new since the last one
+            for i in range(printed_msgs, len(response)):
+                msg = response[i]
+                role = msg.get('role', '')
+                done = i < len(response) - 1  # Earlier messages are complete; the last may still grow
+                if role == 'function':
+                    print(f'\n[TOOL RESULT] {msg.get("name", "")}:')
+                    print(msg.get('content', '')[:500])
+                elif role == 'assistant':
+                    fc = msg.get('function_call')
+                    if fc:
+                        if done:
+                            print(f'\n[TOOL CALL] {fc.get("name", "")}')
+                    else:
+                        content = msg.get('content', '')
+                        if printed_len == 0 and content:
+                            print('\nASSISTANT:')
+                        print(content[printed_len:], end='', flush=True)
+                        printed_len = len(content)
+                if done or role == 'function':  # Tool results arrive whole
+                    printed_msgs = i + 1
+                    printed_len = 0
+        print()
 
         print(time.time() - st, 'seconds elapsed')
         
@@ -21,6 +21,26 @@ def _make_mock_llm():
     return llm
 
 
+class _StubTool:
+    """Minimal stand-in for a tool in ``function_map``; ``call`` is a plain function."""
+
+    __slots__ = ("name", "call")
+
+    def __init__(self, name, call):
+        self.name = name
+        self.call = call
+
+
+def _returning(value):
+    return lambda *args, **kwargs: value
+
+
+def _raising(exc):
+    def call(*args, **kwargs):
+        raise exc
+    return call
+
+
 def _msg(role: str, content, **kwargs):
     return Message(role=role, content=content, **kwargs)
 
@@ -34,63 +54,64 @@ def mock_llm():
     return _make_mock_llm()
 
 
+@pytest.fixture(scope="class")
+def _stub_run():
+    """Keep ``Agent._run`` stubbed for a whole test class instead of patching it per test."""
+    with patch.object(Agent, "_run", return_value=iter([])):
+        yield
+
+
 # ---------------------------------------------------------------------------
 # Tests: Agent.__init__
 # ---------------------------------------------------------------------------
 
+@pytest.mark.usefixtures("_stub_run")
 class TestAgentInit:
 
     @patch("cat_agent.agent.get_chat_model")
     def test_llm_dict_calls_get_chat_model(self, get_chat_model, mock_llm):
         get_chat_model.return_value = mock_llm
-        with patch.object(Agent, "_run", return_value=iter([])):
-            # Use BasicAgent as concrete subclass
-            agent = BasicAgent(llm={"model": "test"})
+        # Use BasicAgent as concrete subclass
+        agent = BasicAgent(llm={"model": "test"})
         get_chat_model.assert_called_once_with({"model": "test"})
         assert agent.llm is mock_llm
 
     def test_llm_object_stored_directly(self, mock_llm):
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm)
+        agent = BasicAgent(llm=mock_llm)
         assert agent.llm is mock_llm
 
     def test_system_message_name_description_stored(self, mock_llm):
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(
-                llm=mock_llm,
-                system_message="You are helpful.",
-                name="my_agent",
-                description="Does things.",
-            )
+        agent = BasicAgent(
+            llm=mock_llm,
+            system_message="You are helpful.",
+            name="my_agent",
+            description="Does things.",
+        )
         assert agent.system_message == "You are helpful."
         assert agent.name == "my_agent"
         assert agent.description == "Does things."
 
     def test_empty_function_list(self, mock_llm):
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm, function_list=[])
+        agent = BasicAgent(llm=mock_llm, function_list=[])
         assert agent.function_map == {}
 
     def test_init_tool_by_string_name(self, mock_llm):
         # Use a tool that is in TOOL_REGISTRY (e.g. storage)
         if "storage" not in TOOL_REGISTRY:
             pytest.skip("storage tool not registered")
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm, function_list=["storage"])
+        agent = BasicAgent(llm=mock_llm, function_list=["storage"])
         assert "storage" in agent.function_map
         assert isinstance(agent.function_map["storage"], TOOL_REGISTRY["storage"])
 
     def test_init_tool_by_base_tool_instance(self, mock_llm):
         tool = MagicMock(spec=BaseTool)
         tool.name = "my_tool"
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm, function_list=[tool])
+        agent = BasicAgent(llm=mock_llm, function_list=[tool])
         assert agent.function_map["my_tool"] is tool
 
     def test_init_tool_unknown_raises(self, mock_llm):
-        with patch.object(Agent, "_run", return_value=iter([])):
-            with pytest.raises(ValueError, match="is not registered"):
-                BasicAgent(llm=mock_llm, function_list=["nonexistent_tool_xyz"])
+        with pytest.raises(ValueError, match="is not registered"):
+            BasicAgent(llm=mock_llm, function_list=["nonexistent_tool_xyz"])
 
 
 # ---------------------------------------------------------------------------
@@ -196,57 +217,47 @@ class TestAgentRunNonstream:
 # Tests: Agent._call_tool
 # ---------------------------------------------------------------------------
 
+@pytest.mark.usefixtures("_stub_run")
 class TestAgentCallTool:
 
     def test_tool_not_in_map_returns_error_string(self, mock_llm):
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm)
+        agent = BasicAgent(llm=mock_llm)
         out = agent._call_tool("nonexistent")
         assert out == "Tool nonexistent does not exists."
 
     def test_tool_returns_str(self, mock_llm):
-        tool = MagicMock()
-        tool.call.return_value = "result text"
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm)
-            agent.function_map["t1"] = tool
+        tool = _StubTool("t1", _returning("result text"))
+        agent = BasicAgent(llm=mock_llm)
+        agent.function_map["t1"] = tool
         out = agent._call_tool("t1", "{}")
         assert out == "result text"
 
     def test_tool_returns_list_of_content_items(self, mock_llm):
         items = [ContentItem(text="a"), ContentItem(text="b")]
-        tool = MagicMock()
-        tool.call.return_value = items
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm)
-            agent.function_map["t1"] = tool
+        tool = _StubTool("t1", _returning(items))
+        agent = BasicAgent(llm=mock_llm)
+        agent.function_map["t1"] = tool
         out = agent._call_tool("t1", "{}")
         assert out == items
 
     def test_tool_returns_dict_serialized_to_json(self, mock_llm):
-        tool = MagicMock()
-        tool.call.return_value = {"key": "value"}
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm)
-            agent.function_map["t1"] = tool
+        tool = _StubTool("t1", _returning({"key": "value"}))
+        agent = BasicAgent(llm=mock_llm)
+        agent.function_map["t1"] = tool
         out = agent._call_tool("t1", "{}")
         assert json.loads(out) == {"key": "value"}
 
     def test_tool_raises_tool_service_error_reraised(self, mock_llm):
-        tool = MagicMock()
-        tool.call.side_effect = ToolServiceError(message="bad")
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm)
-            agent.function_map["t1"] = tool
+        tool = _StubTool("t1", _raising(ToolServiceError(message="bad")))
+        agent = BasicAgent(llm=mock_llm)
+        agent.function_map["t1"] = tool
         with pytest.raises(ToolServiceError):
             agent._call_tool("t1", "{}")
 
     def test_tool_raises_generic_exception_returns_error_message(self, mock_llm):
-        tool = MagicMock()
-        tool.call.side_effect = ValueError("something broke")
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm)
-            agent.function_map["t1"] = tool
+        tool = _StubTool("t1", _raising(ValueError("something broke")))
+        agent = BasicAgent(llm=mock_llm)
+        agent.function_map["t1"] = tool
         out = agent._call_tool("t1", "{}")
         assert "ValueError" in out
         assert "something broke" in out
@@ -256,11 +267,11 @@ class TestAgentCallTool:
 # Tests: Agent._detect_tool
 # ---------------------------------------------------------------------------
 
+@pytest.mark.usefixtures("_stub_run")
 class TestAgentDetectTool:
 
     def test_no_function_call(self, mock_llm):
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm)
+        agent = BasicAgent(llm=mock_llm)
         msg = Message(role=ASSISTANT, content="Just text")
         need, name, args, text = agent._detect_tool(msg)
         assert need is False
@@ -269,8 +280,7 @@ class TestAgentDetectTool:
         assert text == "Just text"
 
     def test_with_function_call(self, mock_llm):
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm)
+        agent = BasicAgent(llm=mock_llm)
         fc = FunctionCall(name="get_weather", arguments='{"location": "NYC"}')
         msg = Message(role=ASSISTANT, content="", function_call=fc)
         need, name, args, text = agent._detect_tool(msg)
@@ -280,8 +290,7 @@ class TestAgentDetectTool:
         assert text == ""
 
     def test_empty_content_becomes_empty_string(self, mock_llm):
-        with patch.object(Agent, "_run", return_value=iter([])):
-            agent = BasicAgent(llm=mock_llm)
+        agent = BasicAgent(llm=mock_llm)
         msg = Message(role=ASSISTANT, content=None)
         _, _, _, text = agent._detect_tool(msg)
         assert text == ""
@@ -24,6 +24,16 @@ class TestBaseSearch:
         assert out[0]["url"] == "u"
         assert "hello" in out[0]["text"][0]
 
+    def test_get_the_front_part_stops_at_budget_and_truncates_next_page(self):
+        pages = [Chunk(content=f"p{i}", metadata={"source": "u", "chunk_id": i}, token=t)
+                 for i, t in enumerate([3, 4, 0, 5])]
+        rec = Record(url="u", raw=pages, title="T")
+        with patch("cat_agent.tools.search_tools.base_search.tokenizer") as tok:
+            tok.truncate.side_effect = lambda text, max_token: f"{text}[:{max_token}]"
+            assert BaseSearch._get_the_front_part([rec], max_ref_token=7)[0]["text"] == ["p0", "p1"]
+            assert BaseSearch._get_the_front_part([rec], max_ref_token=9)[0]["text"] == ["p0", "p1", "p2", "p3[:2]"]
+            assert BaseSearch._get_the_front_part([rec], max_ref_token=0)[0]["text"] == []
+
     def test_format_docs_list_of_strings(self):
         with patch("cat_agent.tools.search_tools.base_search.DocParser") as MockDP:
             MockDP.return_value.split_doc_to_chunk.return_value = [
@@ -27,6 +27,13 @@ class TestDocParserModels:
         assert len(d["raw"]) == 1
         assert d["raw"][0]["content"] == "y"
 
+    def test_record_from_dict_round_trips(self):
+        r = Record(url="http://u", raw=[Chunk(content="y", metadata={"chunk_id": 0}, token=1)], title="T")
+        restored = Record.from_dict(r.to_dict())
+        assert restored == r
+        assert isinstance(restored.raw[0], Chunk)
+        assert not hasattr(restored.raw[0], "__dict__")
+
 
 class TestDocParser:
 
@@ -58,6 +65,57 @@ class TestDocParser:
         assert out["title"] == "Doc"
         assert len(out["raw"]) == 1
 
+    def test_call_warm_hit_served_from_memory(self, doc_parser_path):
+        cached = {"url": "http://x.com/d.pdf", "title": "Doc", "raw": [{"content": "c", "metadata": {}, "token": 1}]}
+        with patch("cat_agent.tools.doc_parser.Storage") as MockStorage:
+            mock_db = MagicMock()
+            mock_db.get.return_value = json.dumps(cached)
+            MockStorage.return_value = mock_db
+            p = DocParser({"path": doc_parser_path})
+            first = p.call({"url": "http://x.com/d.pdf"})
+            first["raw"][0]["metadata"]["edited"] = True
+            first["raw"].clear()
+            second = p.call({"url": "http://x.com/d.pdf"})
+            record = p.load_record("http://x.com/d.pdf")
+        assert second == cached
+        assert isinstance(record, Record) and record is p.load_record("http://x.com/d.pdf")
+        mock_db.get.assert_called_once()
+
+    def test_save_replaces_cached_record_and_drops_it_on_failed_put(self, doc_parser_path):
+        with patch("cat_agent.tools.doc_parser.Storage") as MockStorage:
+            mock_db = MagicMock()
+            MockStorage.return_value = mock_db
+            p = DocParser({"path": doc_parser_path})
+            old = Record(url="u", raw=[], title="old")
+            new = Record(url="u", raw=[], title="new")
+            p._remember("k", old)
+            p._save("k", "k", new)
+            assert p._records["k"] is new
+            mock_db.put.side_effect = OSError("disk full")
+            with pytest.raises(OSError):
+                p._save("k", "k", old)
+        assert "k" not in p._records
+
+    def test_unchunked_record_not_reused_for_smaller_max_ref_token(self, doc_parser_path):
+        doc = [{"page_num": 1, "content": [{"text": f"Paragraph {i}.", "token": 150} for i in range(3)]}]
+        p = DocParser({"path": doc_parser_path, "parser_page_size": 200})
+        p.doc_extractor = MagicMock()
+        p.doc_extractor.call.return_value = doc
+        assert len(p.call({"url": "x.txt"}, max_ref_token=4000)["raw"]) == 1
+        assert len(p.call({"url": "x.txt"}, max_ref_token=300)["raw"]) == 3
+
+    def test_record_cache_bounded(self, doc_parser_path):
+        with patch("cat_agent.tools.doc_parser.Storage") as MockStorage, \
+                patch("cat_agent.tools.doc_parser._RECORD_CACHE_SIZE", 2):
+            mock_db = MagicMock()
+            mock_db.get.side_effect = lambda name: json.dumps({"url": name, "title": "", "raw": []})
+            MockStorage.return_value = mock_db
+            p = DocParser({"path": doc_parser_path})
+            for url in ("a", "b", "a", "c"):
+                p.call({"url": url})
+        assert mock_db.get.call_count == 3  # The repeat of "a" was served from memory
+        assert len(p._records) == 2
+
     def test_split_doc_to_chunk_single_page_under_size(self, doc_parser_path):
         doc = [
             {"page_num": 1, "content": [{"text": "Short paragraph.", "token": 5}]},
@@ -44,6 +44,16 @@ class TestSimulateResponseCompletionWithChat:
         texts = [c.text for c in out[0].content if getattr(c, "text", None)]
         assert "Q?" in texts and "A." in texts
 
+    def test_merge_leaves_input_messages_unchanged(self):
+        messages = [
+            Message(USER, [ContentItem(text="Q?")]),
+            Message(ASSISTANT, [ContentItem(text="A.")]),
+        ]
+        out = simulate_response_completion_with_chat(messages)
+        assert out[0] is not messages[0]
+        assert messages[0].content == [ContentItem(text="Q?")]
+        assert len(out[0].content) == 3
+
 
 class TestValidateNumFncallResults:
 
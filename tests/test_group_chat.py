@@ -5,7 +5,7 @@ from unittest.mock import MagicMock
 import pytest
 
 from cat_agent.agent import BasicAgent
-from cat_agent.llm.schema import ASSISTANT, USER, Message
+from cat_agent.llm.schema import ASSISTANT, USER, ContentItem, Message
 from cat_agent.agents.group_chat import GroupChat
 from cat_agent.agents.user_agent import UserAgent, PENDING_USER_INPUT
 
@@ -83,9 +83,21 @@ class TestGroupChatRun:
         messages = [Message(ASSISTANT, "Hi", name="Bot"), Message(USER, "Hello")]
         messages[1].name = None
         list(chat._run(messages, need_batch_response=False, max_round=1))
-        # _run deep-copies and sets name=role on the copy; run completes without error
+        # _run sets name=role on a copy; run completes without error
         assert messages[1].name is None
 
+    def test_run_shares_message_content_without_mutating_it(self):
+        chat = GroupChat(agents=[], agent_selection_method="round_robin")
+        messages = [Message(ASSISTANT, "Hi", name="Bot"), Message(USER, [ContentItem(text="Hello")])]
+        seen = []
+        chat._gen_one_response = lambda messages, **kwargs: seen.append(messages) or iter([[]])
+        list(chat._run(messages, need_batch_response=False))
+        (passed,) = seen
+        assert passed[0] is messages[0]
+        assert passed[1] is not messages[1] and passed[1].name == USER
+        assert passed[1].content is messages[1].content
+        assert messages[1].content == [ContentItem(text="Hello")] and messages[1].name is None
+
     def test_run_assistant_without_name_raises(self):
         mock_llm = MagicMock()
         sub = BasicAgent(llm=mock_llm)
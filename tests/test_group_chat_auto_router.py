@@ -33,6 +33,17 @@ class TestGroupChatAutoRouter:
         assert "助手" in host.system_message
         assert "[STOP]" in host.system_message
 
+    def test_init_reuses_system_prompt_for_same_roster(self):
+        mock_llm = MagicMock()
+        sub = BasicAgent(llm=mock_llm)
+        sub.name = "Alice"
+        sub.description = "Helper"
+        first = GroupChatAutoRouter(llm=mock_llm, agents=[sub])
+        hits = GroupChatAutoRouter._build_system_prompt.cache_info().hits
+        second = GroupChatAutoRouter(llm=mock_llm, agents=[sub])
+        assert second.system_message == first.system_message
+        assert GroupChatAutoRouter._build_system_prompt.cache_info().hits == hits + 1
+
     def test_run_builds_dialogue_from_messages(self):
         mock_llm = MagicMock()
         mock_llm.chat = MagicMock(return_value=iter([[Message(ASSISTANT, "Alice", name="Host")]]))
@@ -89,3 +100,20 @@ class TestGroupChatAutoRouter:
         assert "Alice:" in user_content
         assert "First line" in user_content
         assert "Second line" in user_content
+
+    def test_run_does_not_fuse_speakers_sharing_a_name_prefix(self):
+        mock_llm = MagicMock()
+        mock_llm.chat = MagicMock(return_value=iter([[Message(ASSISTANT, "Al", name="Host")]]))
+        sub = BasicAgent(llm=mock_llm)
+        sub.name = "Al"
+        sub.description = "A"
+        host = GroupChatAutoRouter(llm=mock_llm, agents=[sub])
+        messages = [
+            Message(SYSTEM, "Sys"),
+            Message(ASSISTANT, "One", name="Al"),
+            Message(ASSISTANT, "Two", name="Al"),
+            Message(ASSISTANT, "Three", name="Alice"),
+        ]
+        list(host._run(messages, lang="en"))
+        user_content = mock_llm.chat.call_args[1]["messages"][1].content
+        assert user_content == "Al: One\nTwo\nAlice: Three"
@@ -39,6 +39,9 @@ class TestKeywordSearchHelpers:
         out = tokenize_and_filter("the and a")
         assert out == [] or all(w not in WORDS_TO_IGNORE for w in out)
 
+    def test_tokenize_and_filter_drops_punctuation_only_tokens(self):
+        assert tokenize_and_filter("U.S.A. -- 50% ... e-mail") == ["u.s.a.", "50%", "e-mail"]
+
     def test_tokenize_and_filter_numbers(self):
         out = tokenize_and_filter("version 2.5")
         assert len(out) >= 1
@@ -63,6 +66,9 @@ class TestKeywordSearchHelpers:
         out = parse_keyword('{"keywords_zh": ["关键词"], "keywords_en": ["keyword"], "text": "content"}')
         assert isinstance(out, list)
 
+    def test_parse_keyword_accepts_json5_payload(self):
+        assert parse_keyword("{keywords_en: ['Running'], text: 'quick fox',}") == ["run", "quick", "fox"]
+
 
 class TestKeywordSearch:
 
@@ -102,3 +108,28 @@ class TestKeywordSearch:
         assert len(out) == 2
         assert all(len(t) == 3 for t in out)
         assert out[0][2] >= out[1][2]
+
+    def test_bm25_index_matches_rank_bm25(self):
+        rank_bm25 = pytest.importorskip("rank_bm25")
+        import numpy as np
+
+        from cat_agent.tools.search_tools.keyword_search import _BM25Index
+
+        corpus = [["a", "b", "a"], ["b", "c"], [], ["d", "a", "c", "c"]]
+        query = ["a", "c", "missing", "a"]
+        expected = rank_bm25.BM25Okapi(corpus).get_scores(query)
+        assert np.array_equal(_BM25Index(corpus).get_scores(query), expected)
+
+    def test_corpus_index_reused_across_queries(self):
+        pytest.importorskip("rank_bm25")
+        search = KeywordSearch()
+        c1 = Chunk(content="machine learning", metadata={"source": "u", "chunk_id": 0}, token=2)
+        c2 = Chunk(content="python programming", metadata={"source": "u", "chunk_id": 1}, token=2)
+        c3 = Chunk(content="garden tools", metadata={"source": "u", "chunk_id": 2}, token=2)
+        rec = Record(url="u", raw=[c1, c2, c3], title="T")
+        search.sort_by_scores(query="machine", docs=[rec])
+        with patch("cat_agent.tools.search_tools.keyword_search.split_text_into_keywords",
+                   wraps=split_text_into_keywords) as split:
+            out = search.sort_by_scores(query="python", docs=[rec])
+        assert split.call_count == 1  # Only the query; the chunks were not re-tokenized
+        assert out[0][1] == 1
@@ -1,6 +1,8 @@
 """Tests for cat_agent.tools.search_tools.leann_search."""
 
 import builtins
+import os
+from array import array
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -9,6 +11,16 @@ from cat_agent.tools.doc_parser import Chunk, Record
 from cat_agent.tools.search_tools.leann_search import LeannSearch
 
 
+@pytest.fixture(autouse=True)
+def leann_workspace(tmp_path_factory):
+    """Keep index files out of the real workspace. The index directory is created up front because some tests
+    patch os.path.exists to True, which would make os.makedirs skip the missing parents."""
+    workspace = tmp_path_factory.mktemp("workspace")
+    os.makedirs(workspace / "storage" / "leann_indexes")
+    with patch("cat_agent.tools.search_tools.leann_search.DEFAULT_WORKSPACE", str(workspace)):
+        yield workspace
+
+
 class TestLeannSearchInit:
 
     def test_init_default_rebuild_rag_none(self):
@@ -23,6 +35,16 @@ class TestLeannSearchInit:
         s = LeannSearch({"rebuild_rag": False})
         assert s.rebuild_rag is False
 
+    def test_init_hnsw_params(self):
+        s = LeannSearch()
+        assert (s.hnsw_m, s.hnsw_ef_construction, s.hnsw_ef_search) == (16, 100, 50)
+        s = LeannSearch({"hnsw_m": 32, "hnsw_ef_construction": 200, "hnsw_ef_search": 64})
+        assert (s.hnsw_m, s.hnsw_ef_construction, s.hnsw_ef_search) == (32, 200, 64)
+
+    def test_embedding_options_batch_size(self):
+        assert LeannSearch()._embedding_options() is None
+        assert LeannSearch({"embed_batch_size": 64})._embedding_options() == {"batch_size": 64}
+
 
 class TestLeannSearchSortByScores:
 
@@ -97,7 +119,7 @@ class TestLeannSearchSortByScores:
         # Simulate index already exists on disk
         with patch("builtins.__import__", side_effect=fake_import):
             with patch("os.path.exists", return_value=True):
-                with patch.object(LeannSearch, "_load_metadata", return_value=[("http://u", 0)]):
+                with patch.object(LeannSearch, "_load_metadata", return_value=(["http://u"], array("i", [0]))):
                     out = search.sort_by_scores("query", [rec])
 
         # Builder should NOT have been called — index must be reused
@@ -108,8 +130,8 @@ class TestLeannSearchSortByScores:
         assert len(out) == 1
         assert out[0][0] == "http://u"
 
-    def test_rebuild_rag_true_always_rebuilds_even_when_index_exists(self):
-        """When rebuild_rag is True the index must be rebuilt even if it already exists."""
+    def test_rebuild_rag_true_rebuilds_changed_corpus_even_when_index_exists(self):
+        """When rebuild_rag is True the index must be rebuilt if the corpus changed, even if it already exists."""
         chunk = Chunk(content="some content", metadata={"source": "http://u", "chunk_id": 0}, token=5)
         rec = Record(url="http://u", raw=[chunk], title="T")
         search = LeannSearch({"rebuild_rag": True})
@@ -131,15 +153,382 @@ class TestLeannSearchSortByScores:
                 return fake_leann
             return real_import(name, *args, **kwargs)
 
-        # Even though index exists, rebuild_rag=True forces a rebuild
+        # Even though index exists, rebuild_rag=True forces a rebuild of a changed corpus
         with patch("builtins.__import__", side_effect=fake_import):
-            with patch("os.path.exists", return_value=True):
+            with patch("os.path.exists", return_value=True), \
+                    patch.object(LeannSearch, "_load_corpus_hash", return_value="stale"):
                 with patch.object(LeannSearch, "_remove_existing_index"):
                     with patch.object(LeannSearch, "_save_metadata"):
                         out = search.sort_by_scores("query", [rec])
 
         # Builder MUST have been called — forced rebuild
         fake_leann.LeannBuilder.assert_called_once()
+        assert fake_leann.LeannBuilder.call_args.kwargs["M"] == 16
+        assert fake_leann.LeannBuilder.call_args.kwargs["efConstruction"] == 100
+        assert mock_searcher.search.call_args.kwargs["complexity"] == 50
         mock_builder.add_text.assert_called_once()
         mock_builder.build_index.assert_called_once()
         assert len(out) == 1
+
+
+class TestLeannSearcherCache:
+
+    @staticmethod
+    def _fake_leann():
+        mock_searcher = MagicMock()
+        mock_result = MagicMock()
+        mock_result.metadata = {"url": "http://u", "chunk_id": 0}
+        mock_result.score = 0.5
+        mock_searcher.search.return_value = [mock_result]
+        fake_leann = MagicMock()
+        fake_leann.LeannBuilder = MagicMock(return_value=MagicMock())
+        fake_leann.LeannSearcher = MagicMock(return_value=mock_searcher)
+        real_import = getattr(builtins, "__import__")
+
+        def fake_import(name, *args, **kwargs):
+            if name == "leann":
+                return fake_leann
+            return real_import(name, *args, **kwargs)
+
+        return fake_leann, fake_import
+
+    @staticmethod
+    def _record():
+        chunk = Chunk(content="some content", metadata={"source": "http://u", "chunk_id": 0}, token=5)
+        return Record(url="http://u", raw=[chunk], title="T")
+
+    def test_searcher_reused_across_calls(self):
+        fake_leann, fake_import = self._fake_leann()
+        search = LeannSearch()
+        with patch("builtins.__import__", side_effect=fake_import):
+            with patch.object(LeannSearch, "_load_metadata", return_value=(["http://u"], array("i", [0]))):
+                search.sort_by_scores("q1", [self._record()])
+                search.sort_by_scores("q2", [self._record()])
+        fake_leann.LeannSearcher.assert_called_once()
+
+    def test_rebuild_recreates_searcher(self):
+        fake_leann, fake_import = self._fake_leann()
+        search = LeannSearch({"rebuild_rag": True})
+        with patch("builtins.__import__", side_effect=fake_import):
+            with patch.object(LeannSearch, "_remove_existing_index"):
+                with patch.object(LeannSearch, "_save_metadata"):
+                    search.sort_by_scores("q1", [self._record()])
+                    search.sort_by_scores("q2", [self._record()])
+        assert fake_leann.LeannSearcher.call_count == 2
+
+    def test_rebuild_skipped_when_corpus_unchanged(self):
+        fake_leann, fake_import = self._fake_leann()
+        search = LeannSearch({"rebuild_rag": True})
+        rec = self._record()
+        with patch("builtins.__import__", side_effect=fake_import):
+            with patch("os.path.exists", return_value=True), \
+                    patch.object(LeannSearch, "_load_corpus_hash", return_value=search._corpus_hash([rec])), \
+                    patch.object(LeannSearch, "_load_metadata", return_value=(["http://u"], array("i", [0]))):
+                out = search.sort_by_scores("q", [rec])
+        fake_leann.LeannBuilder.assert_not_called()
+        assert out == [("http://u", 0, 0.5)]
+
+    def test_results_sorted_by_score_descending(self):
+        fake_leann, fake_import = self._fake_leann()
+        results = []
+        for chunk_id, score in [(0, 0.2), (1, 0.9), (2, 0.5), (3, 0.9)]:
+            r = MagicMock()
+            r.metadata = {"url": "http://u", "chunk_id": chunk_id}
+            r.score = score
+            results.append(r)
+        fake_leann.LeannSearcher.return_value.search.return_value = results
+        search = LeannSearch()
+        with patch("builtins.__import__", side_effect=fake_import):
+            with patch.object(LeannSearch, "_load_metadata", return_value=(["http://u"] * 4, array("i", range(4)))):
+                out = search.sort_by_scores("q", [self._record()])
+        assert out == [("http://u", 1, 0.9), ("http://u", 3, 0.9), ("http://u", 2, 0.5), ("http://u", 0, 0.2)]
+
+
+    def test_aliases_expanded_with_canonical_score(self):
+        fake_leann, fake_import = self._fake_leann()
+        hit = MagicMock()
+        hit.metadata = {"url": "http://a", "chunk_id": 0, "aliases": [["http://b", 2]]}
+        hit.score = 0.7
+        fake_leann.LeannSearcher.return_value.search.return_value = [hit]
+        search = LeannSearch()
+        with patch("builtins.__import__", side_effect=fake_import):
+            with patch.object(LeannSearch, "_load_metadata", return_value=(["http://a", "http://b"], array("i", [0, 2]))):
+                out = search.sort_by_scores("q", [self._record()])
+        assert out == [("http://a", 0, 0.7), ("http://b", 2, 0.7)]
+
+    def test_min_score_filters_unordered_hits(self):
+        fake_leann, fake_import = self._fake_leann()
+        results = []
+        for chunk_id, score in [(2, 0.1), (1, 0.5), (3, 0.05), (0, 0.9)]:
+            r = MagicMock()
+            r.metadata = {"url": "http://u", "chunk_id": chunk_id}
+            r.score = score
+            results.append(r)
+        fake_leann.LeannSearcher.return_value.search.return_value = results
+        search = LeannSearch({"leann_min_score": 0.2})
+        with patch("builtins.__import__", side_effect=fake_import):
+            with patch.object(LeannSearch, "_load_metadata", return_value=(["http://u"] * 4, array("i", range(4)))):
+                out = search.sort_by_scores("q", [self._record()])
+        assert out == [("http://u", 0, 0.9), ("http://u", 1, 0.5)]
+
+    def test_empty_corpus_skips_searcher(self):
+        fake_leann, fake_import = self._fake_leann()
+        search = LeannSearch()
+        with patch("builtins.__import__", side_effect=fake_import):
+            with patch.object(LeannSearch, "_load_metadata", return_value=([], array("i"))):
+                assert search.sort_by_scores("q", []) == []
+        fake_leann.LeannSearcher.assert_not_called()
+
+    def test_top_k_clamped_to_chunk_count(self):
+        fake_leann, fake_import = self._fake_leann()
+        search = LeannSearch({"leann_top_k": 100})
+        with patch("builtins.__import__", side_effect=fake_import):
+            with patch.object(LeannSearch, "_load_metadata", return_value=(["http://u"], array("i", [0]))):
+                search.sort_by_scores("q", [self._record()])
+        assert fake_leann.LeannSearcher.return_value.search.call_args.kwargs["top_k"] == 1
+
+
+class TestLeannSearchHelpers:
+
+    def test_add_docs_to_builder_length_sorted(self):
+        long_chunk = Chunk(content="a much longer chunk of text", metadata={}, token=6)
+        short_chunk = Chunk(content="short", metadata={}, token=1)
+        rec = Record(url="http://u", raw=[long_chunk, short_chunk], title="T")
+        builder = MagicMock()
+
+        texts = LeannSearch._add_docs_to_builder(builder, [rec])
+
+        added = [c.args[0] for c in builder.add_text.call_args_list]
+        assert added == texts == ["short", "a much longer chunk of text"]
+        assert builder.add_text.call_args_list[0].kwargs["metadata"] == {"url": "http://u", "chunk_id": 1}
+
+    def test_add_docs_to_builder_dedupes_identical_chunks(self):
+        rec_a = Record(url="http://a", raw=[Chunk(content="same", metadata={}, token=1),
+                                            Chunk(content="unique text", metadata={}, token=2)], title="A")
+        rec_b = Record(url="http://b", raw=[Chunk(content="same", metadata={}, token=1)], title="B")
+        builder = MagicMock()
+
+        texts = LeannSearch._add_docs_to_builder(builder, [rec_a, rec_b])
+
+        assert texts == ["same", "unique text"]
+        assert builder.add_text.call_args_list[0].kwargs["metadata"] == {
+            "url": "http://a", "chunk_id": 0, "aliases": [["http://b", 0]]}
+        assert builder.add_text.call_args_list[1].kwargs["metadata"] == {"url": "http://a", "chunk_id": 1}
+
+    def test_collect_chunks_from_docs(self):
+        rec = Record(url="http://u", raw=[Chunk(content="a", metadata={}, token=1)] * 2, title="T")
+        chunk_urls, chunk_ids = LeannSearch._collect_chunks_from_docs([rec])
+        assert chunk_urls == ["http://u", "http://u"]
+        assert list(chunk_ids) == [0, 1]
+
+    def test_corpus_hash_tracks_content_and_params(self):
+        rec = Record(url="http://u", raw=[Chunk(content="abc", metadata={}, token=1)], title="T")
+        changed = Record(url="http://u", raw=[Chunk(content="abd", metadata={}, token=1)], title="T")
+        search = LeannSearch()
+        assert search._corpus_hash([rec]) == LeannSearch()._corpus_hash([rec])
+        assert search._corpus_hash([rec]) != search._corpus_hash([changed])
+        assert search._corpus_hash([rec]) != LeannSearch({"hnsw_m": 32})._corpus_hash([rec])
+
+    def test_metadata_roundtrip_with_corpus_hash(self, tmp_path):
+        meta_path = str(tmp_path / "meta.pkl")
+        LeannSearch._save_metadata(meta_path, ["http://u", "http://u"], array("i", [0, 1]), "abc123")
+        assert LeannSearch._load_metadata(meta_path) == (["http://u", "http://u"], array("i", [0, 1]))
+        assert LeannSearch._load_corpus_hash(meta_path) == "abc123"
+        assert LeannSearch._load_corpus_hash(str(tmp_path / "missing.json")) is None
+
+    def test_save_metadata_replaces_atomically(self, tmp_path):
+        meta_path = str(tmp_path / "meta.pkl")
+        LeannSearch._save_metadata(meta_path, ["http://old"], array("i", [0]), "old")
+        with patch("cat_agent.tools.search_tools.leann_search.pickle.dump", side_effect=OSError("disk full")):
+            LeannSearch._save_metadata(meta_path, ["http://new"], array("i", [0]), "new")
+        assert LeannSearch._load_corpus_hash(meta_path) == "old"
+        LeannSearch._save_metadata(meta_path, ["http://new"], array("i", [0]), "new")
+        assert LeannSearch._load_corpus_hash(meta_path) == "new"
+        assert os.listdir(tmp_path) == ["meta.pkl"]
+
+    def test_load_metadata_legacy_json(self, tmp_path):
+        import json
+
+        (tmp_path / "meta.json").write_text(json.dumps({"chunks": [["http://u", 3]], "corpus_hash": "h"}))
+        meta_path = str(tmp_path / "meta.pkl")
+        assert LeannSearch._load_metadata(meta_path) == (["http://u"], array("i", [3]))
+        assert LeannSearch._load_corpus_hash(meta_path) == "h"
+
+    def test_load_metadata_corrupt_file(self, tmp_path):
+        meta_path = tmp_path / "meta.pkl"
+        meta_path.write_bytes(b"not a pickle")
+        assert LeannSearch._load_metadata(str(meta_path)) == ([], array("i"))
+
+    @pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="posix_fadvise unavailable")
+    def test_prefetch_index_file(self, tmp_path):
+        (tmp_path / "rag_index.index").write_bytes(b"graph")
+        with patch("os.posix_fadvise") as mock_fadvise:
+            LeannSearch._prefetch_index_file(str(tmp_path / "rag_index.leann"))
+        mock_fadvise.assert_called_once()
+        assert mock_fadvise.call_args.args[3] == os.POSIX_FADV_WILLNEED
+
+    def test_prefetch_missing_index_file_is_noop(self, tmp_path):
+        LeannSearch._prefetch_index_file(str(tmp_path / "missing.leann"))
+
+
+class TestLeannEmbeddingCache:
+
+    def test_only_new_chunks_are_embedded(self, tmp_path):
+        np = pytest.importorskip("numpy")
+        calls = []
+
+        def fake_compute(texts, *args, **kwargs):
+            calls.append(list(texts))
+            return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+        with patch.object(LeannSearch, "_embedding_cache_dir", return_value=str(tmp_path)):
+            first = LeannSearch()._embed_with_cache(["aa", "bbb", "aa"], fake_compute)
+            # A fresh instance has an empty in-memory cache, so hits must come from disk
+            second = LeannSearch()._embed_with_cache(["bbb", "cccc"], fake_compute)
+
+        assert calls == [["aa", "bbb"], ["cccc"]]
+        assert first.shape == (3, 2) and first.dtype == np.float32
+        assert first[0].tolist() == first[2].tolist() == [2.0, 1.0]
+        assert second.tolist() == [[3.0, 1.0], [4.0, 1.0]]
+
+    def test_cache_stored_as_float16(self, tmp_path):
+        np = pytest.importorskip("numpy")
+        compute = lambda texts, *a, **k: np.full((len(texts), 4), 0.25, dtype=np.float32)  # noqa: E731
+
+        with patch.object(LeannSearch, "_embedding_cache_dir", return_value=str(tmp_path)):
+            out = LeannSearch()._embed_with_cache(["abc"], compute)
+
+        (cached,) = tmp_path.glob("*.npy")
+        assert np.load(cached).dtype == np.float16
+        assert out.dtype == np.float32 and out.tolist() == [[0.25] * 4]
+
+    def test_cached_embeddings_match_cold_build_and_keep_ranking(self, tmp_path):
+        np = pytest.importorskip("numpy")
+        rng = np.random.default_rng(0)
+        texts = [f"chunk {i}" for i in range(200)]
+        exact = rng.standard_normal((len(texts), 768)).astype(np.float32)
+        exact /= np.linalg.norm(exact, axis=1, keepdims=True)
+        compute = lambda batch, *a, **k: exact[[texts.index(t) for t in batch]]  # noqa: E731
+
+        with patch.object(LeannSearch, "_embedding_cache_dir", return_value=str(tmp_path)):
+            cold = LeannSearch()._embed_with_cache(texts, compute)
+            warm = LeannSearch()._embed_with_cache(texts, lambda *a, **k: pytest.fail("re-embedded"))
+
+        assert np.array_equal(cold, warm)
+        queries = rng.standard_normal((20, 768)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        scores_exact, scores_cached = queries @ exact.T, queries @ cold.T
+        assert np.abs(scores_exact - scores_cached).max() < 1e-3
+        # Only near-ties may swap places; the top hits stay the same
+        top_exact = np.sort(np.argsort(-scores_exact, axis=1)[:, :10], axis=1)
+        top_cached = np.sort(np.argsort(-scores_cached, axis=1)[:, :10], axis=1)
+        assert np.array_equal(top_exact, top_cached)
+
+    def test_build_index_uses_precomputed_embeddings(self, tmp_path):
+        np = pytest.importorskip("numpy")
+        import sys
+        import types
+
+        fake_module = types.ModuleType("leann.embedding_compute")
+        fake_module.compute_embeddings = lambda texts, *a, **k: np.ones((len(texts), 2), dtype=np.float32)
+        builder = MagicMock()
+        index_path = str(tmp_path / "rag_index.leann")
+
+        with patch.dict(sys.modules, {"leann.embedding_compute": fake_module}):
+            with patch.object(LeannSearch, "_embedding_cache_dir", return_value=str(tmp_path / "cache")):
+                LeannSearch()._build_index(builder, ["x", "y"], index_path)
+
+        builder.build_index.assert_not_called()
+        builder.build_index_from_embeddings.assert_called_once_with(index_path, f"{index_path}.embeddings.pkl")
+        assert not (tmp_path / "rag_index.leann.embeddings.pkl").exists()
+
+    def test_build_index_prunes_embeddings_of_removed_chunks(self, tmp_path):
+        np = pytest.importorskip("numpy")
+        import sys
+        import types
+
+        fake_module = types.ModuleType("leann.embedding_compute")
+        fake_module.compute_embeddings = lambda texts, *a, **k: np.ones((len(texts), 2), dtype=np.float32)
+        cache_dir = tmp_path / "cache"
+        search = LeannSearch()
+
+        with patch.dict(sys.modules, {"leann.embedding_compute": fake_module}):
+            with patch.object(LeannSearch, "_embedding_cache_dir", return_value=str(cache_dir)):
+                search._build_index(MagicMock(), ["x", "y"], str(tmp_path / "i.leann"))
+                search._build_index(MagicMock(), ["y", "z"], str(tmp_path / "i.leann"))
+
+        kept = {p.stem for p in cache_dir.glob("*.npy")}
+        assert kept == {LeannSearch._embedding_key("y"), LeannSearch._embedding_key("z")}
+        assert set(search._embedding_cache) == kept
+
+    def test_memory_cache_is_bounded(self, tmp_path):
+        np = pytest.importorskip("numpy")
+        compute = lambda texts, *a, **k: np.ones((len(texts), 2), dtype=np.float32)  # noqa: E731
+        search = LeannSearch()
+
+        with patch("cat_agent.tools.search_tools.leann_search._EMBEDDING_MEMORY_CACHE_SIZE", 2):
+            with patch.object(LeannSearch, "_embedding_cache_dir", return_value=str(tmp_path)):
+                out = search._embed_with_cache(["a", "b", "c"], compute)
+
+        assert out.shape == (3, 2)
+        assert list(search._embedding_cache) == [LeannSearch._embedding_key(t) for t in ("b", "c")]
+
+    @pytest.mark.parametrize("error", [
+        TypeError("unexpected keyword"),
+        AttributeError("no such method"),
+        ValueError("bad embeddings file"),
+        RuntimeError("backend error"),
+    ])
+    def test_build_index_falls_back_on_api_mismatch(self, tmp_path, error):
+        np = pytest.importorskip("numpy")
+        import sys
+        import types
+
+        fake_module = types.ModuleType("leann.embedding_compute")
+        fake_module.compute_embeddings = lambda texts, *a, **k: np.ones((len(texts), 2), dtype=np.float32)
+        builder = MagicMock()
+        index_path = str(tmp_path / "i.leann")
+
+        def partial_build(path, embeddings_file):
+            for leftover in (f"{path}.meta.json", f"{path}.passages.jsonl", str(tmp_path / "i.index")):
+                open(leftover, "w").close()
+            raise error
+
+        builder.build_index_from_embeddings.side_effect = partial_build
+
+        with patch.dict(sys.modules, {"leann.embedding_compute": fake_module}):
+            with patch.object(LeannSearch, "_embedding_cache_dir", return_value=str(tmp_path / "cache")):
+                LeannSearch()._build_index(builder, ["x"], index_path)
+
+        builder.build_index.assert_called_once_with(index_path)
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["cache"]
+
+    def test_build_index_cache_disabled(self, tmp_path):
+        builder = MagicMock()
+        LeannSearch({"embed_cache": False})._build_index(builder, ["x"], str(tmp_path / "i.leann"))
+        builder.build_index.assert_called_once()
+
+
+class TestResultExtractor:
+
+    def test_attribute_results(self):
+        from cat_agent.tools.search_tools.leann_search import _result_extractor
+
+        r = MagicMock(metadata={"url": "u", "chunk_id": 1}, score=0.3)
+        assert _result_extractor(r)(r) == ({"url": "u", "chunk_id": 1}, 0.3)
+
+    def test_dict_results(self):
+        from cat_agent.tools.search_tools.leann_search import _result_extractor
+
+        r = {"meta": {"url": "u", "chunk_id": 2}, "score": 0.4}
+        assert _result_extractor(r)(r) == ({"url": "u", "chunk_id": 2}, 0.4)
+
+    def test_legacy_meta_attribute(self):
+        from cat_agent.tools.search_tools.leann_search import _result_extractor
+
+        class Legacy:
+            meta = {"url": "u", "chunk_id": 3}
+            score = 0.5
+
+        r = Legacy()
+        assert _result_extractor(r)(r) == ({"url": "u", "chunk_id": 3}, 0.5)
@@ -241,6 +241,19 @@ class TestConvertMessages:
         assert content[0]["type"] == "image_url"
         assert content[1] == {"type": "text", "text": "What is this?"}
 
+    def test_local_images_across_messages_encoded_in_order(self):
+        pytest.importorskip("llama_cpp")
+        model = _make_model()
+        msgs = [
+            Message(USER, [ContentItem(image="/tmp/a.jpg"), ContentItem(text="and")]),
+            {"role": "user", "content": [{"image": "/tmp/b.jpg"}, {"image": "https://example.com/c.jpg"}]},
+        ]
+        with patch("os.path.exists", return_value=True), \
+             patch("cat_agent.llm.llama_cpp_vision.encode_image_as_base64", side_effect=lambda p, **kw: f"data:{p}"):
+            out = model._convert_messages(msgs)
+        assert out[0]["content"][0]["image_url"]["url"] == "data:/tmp/a.jpg"
+        assert [c["image_url"]["url"] for c in out[1]["content"]] == ["data:/tmp/b.jpg", "https://example.com/c.jpg"]
+
     def test_dict_input_with_text(self):
         pytest.importorskip("llama_cpp")
         model = _make_model()
@@ -60,6 +60,10 @@ class TestGetPlainDoc:
     def test_empty_content(self):
         assert get_plain_doc([{"page_num": 1, "content": []}]) == ""
 
+    def test_ignores_metadata_keys(self):
+        doc = [{"page_num": 1, "content": [{"text": "Hello", "token": 1}, {"table": "|a|", "token": 2}]}]
+        assert get_plain_doc(doc) == f"Hello{PARAGRAPH_SPLIT_SYMBOL}|a|"
+
 
 class TestDocParserError:
 
@@ -228,6 +232,28 @@ class TestParseWord:
 
         assert doc == [{"page_num": 1, "content": []}]
 
+    def test_streaming_matches_python_docx(self, tmp_path):
+        docx = pytest.importorskip("docx")
+        from cat_agent.tools.parsers.word_parser import _parse_word_docx, parse_word
+
+        d = docx.Document()
+        d.add_paragraph("Hello\tworld")
+        table = d.add_table(rows=3, cols=3)
+        for i, row in enumerate(table.rows):
+            for j, cell in enumerate(row.cells):
+                cell.text = f"{i}{j}"
+        table.cell(0, 0).merge(table.cell(0, 1))
+        table.cell(1, 2).merge(table.cell(2, 2))
+        d.add_paragraph("Outro")
+        path = str(tmp_path / "real.docx")
+        d.save(path)
+
+        with patch("docx.Document") as mock_document:
+            doc = parse_word(path)
+
+        mock_document.assert_not_called()
+        assert doc[0]["content"] == _parse_word_docx(path)
+
 
 # ===========================================================================
 # ppt_parser.py
@@ -498,6 +524,38 @@ class TestPdfParserHelpers:
         from cat_agent.tools.parsers.pdf_parser import _table_to_string
         assert _table_to_string([["only"]]) == "|only|"
 
+    def _fake_line(self, fonts):
+        from pdfminer.layout import LTChar, LTTextContainer
+
+        chars = []
+        for name, size in fonts:
+            ch = MagicMock(spec=LTChar)
+            ch.fontname, ch.size = name, size
+            chars.append(ch)
+        line = MagicMock(spec=LTTextContainer)
+        line.__iter__.return_value = iter(chars)
+        return line
+
+    def test_get_font_most_common(self):
+        pytest.importorskip("pdfminer")
+        from cat_agent.tools.parsers.pdf_parser import _get_font
+
+        element = [self._fake_line([("A", 10), ("B", 12), ("B", 12)])]
+        assert _get_font(element) == ("B", 12)
+
+    def test_get_font_tie_prefers_first_seen(self):
+        pytest.importorskip("pdfminer")
+        from cat_agent.tools.parsers.pdf_parser import _get_font
+
+        element = [self._fake_line([("A", 10), ("B", 12)])]
+        assert _get_font(element) == ("A", 10)
+
+    def test_get_font_no_chars(self):
+        pytest.importorskip("pdfminer")
+        from cat_agent.tools.parsers.pdf_parser import _get_font
+
+        assert _get_font([]) == []
+
 
 class TestParsePdf:
 
@@ -619,6 +677,26 @@ class TestParsePdf:
         assert "(cid:1)" not in result[0]["text"]
         assert "obj" not in result[0]
 
+    def test_tables_extracted_once_per_page(self, tmp_path):
+        pytest.importorskip("pdfplumber")
+        from pdfminer.layout import LTRect
+        from cat_agent.tools.parsers.pdf_parser import parse_pdf
+
+        page_layout = MagicMock()
+        page_layout.pageid = 1
+        page_layout.__iter__.return_value = iter([LTRect(1, (0, 0, 10, 10)), LTRect(1, (20, 20, 30, 30))])
+        fake_pdf = MagicMock()
+        fake_pdf.pages[0].extract_tables.return_value = []
+
+        with patch("pdfplumber.open", return_value=fake_pdf), \
+                patch("pdfminer.high_level.extract_pages", return_value=[page_layout]):
+            path = tmp_path / "f.pdf"
+            path.write_bytes(b"%PDF-1.4")
+            doc = parse_pdf(str(path))
+
+        assert doc == [{"page_num": 1, "content": []}]
+        fake_pdf.pages[0].extract_tables.assert_called_once()
+        fake_pdf.close.assert_called_once()
 
 # ===========================================================================
 # excel_parser.py
@@ -686,6 +764,29 @@ class TestDfToMd:
                     # This is a separator-like cell, long dashes should be collapsed
                     assert "------" not in cell
 
+    def test_empty_dataframe_keeps_header(self):
+        pl = pytest.importorskip("polars")
+        from cat_agent.tools.parsers.excel_parser import df_to_md
+
+        md = df_to_md(pl.DataFrame({"a": [], "b": []}))
+        assert md.split("\n")[0] == "| a | b |"
+        assert len(md.split("\n")) == 2
+
+    def test_single_row(self):
+        pl = pytest.importorskip("polars")
+        from cat_agent.tools.parsers.excel_parser import df_to_md
+
+        md = df_to_md(pl.DataFrame({"a": [None], "b": [3]}))
+        assert md.split("\n")[0] == "| b |"
+        assert md.split("\n")[2] == "| 3 |"
+
+    def test_single_all_null_row_dropped(self):
+        pl = pytest.importorskip("polars")
+        from cat_agent.tools.parsers.excel_parser import df_to_md
+
+        md = df_to_md(pl.DataFrame({"a": [None], "b": [None]}))
+        assert len(md.split("\n")) == 2
+
 
 class TestParseExcel:
 
@@ -827,3 +928,53 @@ class TestParseDocumentDispatch:
                 doc = parse_document("/f.txt")
 
         assert doc[0]["content"][0]["text"] == "auto"
+
+    def test_import_warmup_starts_once(self, monkeypatch):
+        import cat_agent.tools.parsers as parsers
+
+        monkeypatch.setattr(parsers, "_warmup_started", False)
+        with patch("cat_agent.tools.parsers.threading.Thread") as mock_thread:
+            with patch("cat_agent.tools.parsers.txt_parser.read_text_from_file", return_value="hi"):
+                parsers.parse_document("/f.txt", file_type="txt")
+                parsers.parse_document("/f.txt", file_type="txt")
+
+        assert mock_thread.call_count == 1
+        mock_thread.return_value.start.assert_called_once()
+
+
+class TestParseDocumentCache:
+
+    def test_unchanged_file_parsed_once(self, tmp_path):
+        from cat_agent.tools.parsers import parse_document
+
+        path = tmp_path / "cached.txt"
+        path.write_text("hello", encoding="utf-8")
+
+        with patch("cat_agent.tools.parsers.txt_parser.read_text_from_file", return_value="hello") as mock_read:
+            first = parse_document(str(path), file_type="txt")
+            second = parse_document(str(path), file_type="txt")
+
+        assert mock_read.call_count == 1
+        assert first == second
+
+    def test_result_mutation_does_not_poison_cache(self, tmp_path):
+        from cat_agent.tools.parsers import parse_document
+
+        path = tmp_path / "mutate.txt"
+        path.write_text("original", encoding="utf-8")
+
+        first = parse_document(str(path), file_type="txt")
+        first[0]["content"][0]["text"] = "changed"
+        second = parse_document(str(path), file_type="txt")
+
+        assert second[0]["content"][0]["text"] == "original"
+
+    def test_modified_file_is_reparsed(self, tmp_path):
+        from cat_agent.tools.parsers import parse_document
+
+        path = tmp_path / "modified.txt"
+        path.write_text("v1", encoding="utf-8")
+        assert parse_document(str(path), file_type="txt")[0]["content"][0]["text"] == "v1"
+
+        path.write_text("version2", encoding="utf-8")
+        assert parse_document(str(path), file_type="txt")[0]["content"][0]["text"] == "version2"
@@ -2,6 +2,7 @@
 
 from unittest.mock import patch
 
+from cat_agent.tools.doc_parser import Chunk, Record
 from cat_agent.tools.retrieval import Retrieval
 
 
@@ -24,13 +25,13 @@ class TestRetrieval:
     def test_call_with_mocked_doc_parse_and_search(self):
         with patch("cat_agent.tools.retrieval.DocParser"):
             r = Retrieval({"rag_searchers": ["front_page_search"]})
-        record_dict = {"url": "u", "raw": [{"content": "c", "metadata": {}, "token": 1}], "title": "T"}
+        record = Record(url="u", raw=[Chunk(content="c", metadata={}, token=1)], title="T")
         with patch("cat_agent.tools.retrieval._check_deps_for_rag"):
             with patch.object(r, "doc_parse") as mock_parse:
-                mock_parse.call.return_value = record_dict
+                mock_parse.load_record.return_value = record
                 with patch.object(r, "search") as mock_search:
                     mock_search.call.return_value = []
                     out = r.call({"query": "q", "files": ["/path/to/file.txt"]})
         assert out == []
-        assert mock_parse.call.call_count == 1
-        mock_search.call.assert_called_once()
+        mock_parse.load_record.assert_called_once_with("/path/to/file.txt")
+        assert mock_search.call.call_args.kwargs["docs"] == [record]
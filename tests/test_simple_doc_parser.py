@@ -6,6 +6,7 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from cat_agent.tools.storage import KeyNotExistsError
+from cat_agent.utils.misc import hash_sha256
 from cat_agent.tools.simple_doc_parser import (
     PARAGRAPH_SPLIT_SYMBOL,
     PARSER_SUPPORTED_FILE_TYPES,
@@ -215,6 +216,21 @@ class TestSimpleDocParser:
             out = p.call('{"url": "http://example.com/doc.txt"}')
         assert "cached" in out
 
+    def test_call_cache_roundtrip_compact_unicode(self, parser_path):
+        p = SimpleDocParser({"path": parser_path, "structured_doc": True})
+        parsed = [{"page_num": 1, "content": [{"text": "héllo 世界"}]}]
+        with patch("cat_agent.tools.simple_doc_parser.get_file_type", return_value="txt"):
+            with patch("cat_agent.tools.simple_doc_parser.parse_document", return_value=parsed):
+                first = p.call('{"url": "/local/cached.txt"}')
+        stored = p.db.get(f'{hash_sha256("/local/cached.txt")}_ori')
+        assert "\n" not in stored
+        assert "世界" in stored
+        assert p.call('{"url": "/local/cached.txt"}') == first
+
+    def test_resolve_path_keeps_urls_and_windows_drives(self):
+        for path in ("https://a.com/x.pdf", "http://a.com/x.pdf", "C:\\docs\\x.pdf", "d:/docs/x.pdf"):
+            assert SimpleDocParser._resolve_path(path) == path
+
     def test_call_parse_txt_integration(self, parser_path):
         p = SimpleDocParser({"path": parser_path})
         with patch("cat_agent.tools.simple_doc_parser.get_file_type", return_value="txt"):
@@ -1,6 +1,7 @@
 """Tests for cat_agent.tools.storage."""
 
 import tempfile
+from unittest.mock import patch
 
 import pytest
 
@@ -43,6 +44,12 @@ class TestStorage:
         out = storage.call({"operate": "delete", "key": "nonexistent"})
         assert "Delete Failed" in out
 
+    def test_delete_flushed_key_twice(self, storage):
+        storage.call({"operate": "put", "key": "k3", "value": "v3"})
+        storage.flush()
+        assert "Successfully deleted" in storage.call({"operate": "delete", "key": "k3"})
+        assert "Delete Failed" in storage.call({"operate": "delete", "key": "k3"})
+
     def test_scan_empty_returns_fail_message(self, storage):
         out = storage.call({"operate": "scan", "key": "/"})
         assert "Scan Failed" in out or "does not exist" in out
@@ -52,3 +59,129 @@ class TestStorage:
         storage.call({"operate": "put", "key": "a/2", "value": "v2"})
         out = storage.call({"operate": "scan", "key": "a"})
         assert "v1" in out and "v2" in out
+
+    def test_instances_share_staged_writes(self, storage_path):
+        first = Storage({"storage_root_path": storage_path})
+        second = Storage({"storage_root_path": storage_path})
+        with patch("cat_agent.tools.storage._FLUSH_INTERVAL", 60):
+            first.put("k", "v")
+            assert second.get("k") == "v"
+            second.delete("k")
+            with pytest.raises(KeyNotExistsError):
+                first.get("k")
+
+    def test_writes_from_another_process_are_kept(self, storage_path):
+        import subprocess
+        import sys
+
+        storage = Storage({"storage_root_path": storage_path})
+        storage.put("p/A", "1", sync=True)
+        subprocess.run(
+            [sys.executable, "-c",
+             "import sys\n"
+             "from cat_agent.tools.storage import Storage\n"
+             "Storage({'storage_root_path': sys.argv[1]}).put('p/B', '2', sync=True)",
+             storage_path],
+            check=True,
+        )
+        storage.put("p/C", "3", sync=True)
+        assert storage.get("p/B") == "2"
+        assert storage.scan("p") == "/A: 1\n/B: 2\n/C: 3"
+        for key, value in [("p/A", b"1"), ("p/B", b"2"), ("p/C", b"3")]:
+            assert self._on_disk(storage_path, key) == value
+
+    @staticmethod
+    def _on_disk(storage_path, key):
+        import dbm
+        import os
+
+        with dbm.open(os.path.join(storage_path, "storage.db"), "r") as db:
+            return db.get(key.encode())
+
+    def test_writes_are_staged_until_flush(self, storage_path):
+        storage = Storage({"storage_root_path": storage_path})
+        with patch("cat_agent.tools.storage._FLUSH_INTERVAL", 60):
+            storage.put("staged", "v")
+            storage.put("gone", "x")
+            storage.delete("gone")
+        assert storage.get("staged") == "v"
+        assert "gone" not in storage.scan("")
+        storage.flush()
+        assert self._on_disk(storage_path, "staged") == b"v"
+        assert self._on_disk(storage_path, "gone") is None
+
+    def test_put_sync_writes_through(self, storage_path):
+        storage = Storage({"storage_root_path": storage_path})
+        with patch("cat_agent.tools.storage._FLUSH_INTERVAL", 60):
+            storage.put("k", "v", sync=True)
+        assert self._on_disk(storage_path, "k") == b"v"
+
+    def test_tool_put_writes_through(self, storage_path):
+        storage = Storage({"storage_root_path": storage_path})
+        with patch("cat_agent.tools.storage._FLUSH_INTERVAL", 60):
+            assert storage.call({"operate": "put", "key": "k", "value": "v"}) == "Successfully saved k."
+        assert self._on_disk(storage_path, "k") == b"v"
+
+    def test_flush_after_max_ops(self, storage_path):
+        storage = Storage({"storage_root_path": storage_path})
+        with patch("cat_agent.tools.storage._FLUSH_INTERVAL", 60), \
+                patch("cat_agent.tools.storage._FLUSH_MAX_OPS", 2):
+            storage.put("a", "1")
+            storage.put("b", "2")
+        assert self._on_disk(storage_path, "b") == b"2"
+
+    def test_scan_prefix_excludes_siblings(self, storage):
+        for k in ["a", "a/1", "a/2/x", "ab", "b/1", "0"]:
+            storage.put(k, k.upper())
+        storage.delete("a/1")
+        assert storage.scan("a") == "/: A\n/2/x: A/2/X"
+
+    def test_scan_key_with_trailing_slashes(self, storage):
+        storage.put("a/x", "X")
+        storage.put("ab", "AB")
+        assert storage.scan("a//") == "/a/x: X"
+        assert storage.scan("a/") == "/x: X"
+
+    def test_scan_sees_keys_already_on_disk(self, storage_path):
+        import dbm
+        import os
+
+        with dbm.open(os.path.join(storage_path, "storage.db"), "c") as db:
+            db[b"p/1"] = b"one"
+            db[b"q/1"] = b"two"
+        assert Storage({"storage_root_path": storage_path}).scan("p") == "/1: one"
+
+
+class TestLmdbStorage:
+
+    @pytest.fixture
+    def storage_path(self):
+        pytest.importorskip("lmdb")
+        return tempfile.mkdtemp()
+
+    def test_put_get_delete_scan(self, storage_path):
+        storage = Storage({"storage_root_path": storage_path, "storage_backend": "lmdb"})
+        storage.put("a/1", "v1")
+        storage.put("a/2", "v2", sync=True)
+        storage.put("b/1", "v3")
+        assert storage.get("a/1") == "v1"
+        assert storage.delete("a/1") == "Successfully deleted a/1"
+        storage.flush()
+        assert storage.scan("a") == "/2: v2"
+        with pytest.raises(KeyNotExistsError):
+            storage.get("a/1")
+
+    def test_staged_writes_persist_on_close(self, storage_path):
+        import os
+
+        import lmdb
+
+        from cat_agent.tools.storage import _close_all
+
+        storage = Storage({"storage_root_path": storage_path, "storage_backend": "lmdb"})
+        storage.put("k", "v")
+        _close_all()  # Flushes staged writes; LMDB allows only one open environment per file and process
+        env = lmdb.open(os.path.join(storage_path, "storage.lmdb"), subdir=False, readonly=True, lock=False)
+        with env.begin() as txn:
+            assert txn.get(b"k") == b"v"
+        env.close()
@@ -2,6 +2,7 @@
 
 from cat_agent.utils.tokenization_qwen import (
     count_tokens,
+    count_tokens_batch,
     tokenizer,
     VOCAB_FILES_NAMES,
     PAT_STR,
@@ -36,6 +37,10 @@ class TestTokenizationQwen:
         n = count_tokens("hello")
         assert n >= 1
 
+    def test_count_tokens_batch_matches_single(self):
+        texts = ["hello world", "", "你好世界", "<|im_start|>user", "Cafe\u0301"]
+        assert count_tokens_batch(texts) == [count_tokens(t) for t in texts]
+
     def test_vocab_files_names(self):
         assert "vocab_file" in VOCAB_FILES_NAMES
         assert "qwen" in VOCAB_FILES_NAMES["vocab_file"].lower()
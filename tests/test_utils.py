@@ -1,17 +1,24 @@
 """Tests for cat_agent.utils.utils."""
 
+import base64
 from unittest.mock import patch
-from cat_agent.llm.schema import SYSTEM, USER, ContentItem, Message
+
+import pytest
+from cat_agent.llm.schema import ASSISTANT, SYSTEM, USER, ContentItem, Message
 from cat_agent.utils import utils as utils_module
+from cat_agent.utils import media_utils
 from cat_agent.utils.utils import (
+    build_text_completion_prompt,
     extract_code,
     extract_files_from_messages,
     extract_images_from_messages,
     extract_markdown_urls,
     extract_text_from_message,
     extract_urls,
+    format_as_multimodal_message,
     get_basename_from_url,
     get_last_usr_msg_idx,
+    get_local_ip,
     hash_sha256,
     has_chinese_chars,
     has_chinese_messages,
@@ -19,6 +26,7 @@ from cat_agent.utils.utils import (
     is_image,
     json_loads,
     merge_generate_cfgs,
+    print_traceback,
     rm_default_system,
 )
 
@@ -47,6 +55,76 @@ class TestHasChineseChars:
         assert has_chinese_chars(123) is False
         assert has_chinese_chars(["你好"]) is True  # f'{data}' -> "['你好']" contains 你
 
+    def test_containers_checked_item_by_item(self):
+        assert has_chinese_chars(["a", ("b", {"k": "中"})]) is True
+        assert has_chinese_chars({"名": 1}) is True
+        assert has_chinese_chars(["a", ("b", {"k": 1})]) is False
+
+    def test_long_text(self):
+        text = "abc é \ud800 " * 1000
+        assert has_chinese_chars(text) is False
+        assert has_chinese_chars(text + "世") is True
+        assert has_chinese_chars("\u9fff" + text) is True
+
+    def test_long_text_hits_on_window_edges(self):
+        text = "x" * 50000
+        assert has_chinese_chars(text) is False
+        for pos in (0, 4095, 4096, 4096 + 16383, 4096 + 16384, 49999):
+            assert has_chinese_chars(text[:pos] + "中" + text[pos + 1:]) is True
+
+    def test_long_text_stops_at_early_hit(self):
+        with patch("numpy.frombuffer", side_effect=AssertionError("scanned past the hit")):
+            assert has_chinese_chars("中" + "x" * 100000) is True
+
+
+class TestGetLocalIp:
+
+    def test_resolved_once(self):
+        get_local_ip.cache_clear()
+        with patch("socket.socket") as sock_cls:
+            sock_cls.return_value.getsockname.return_value = ("192.0.2.7", 5000)
+            assert get_local_ip() == "192.0.2.7"
+            assert get_local_ip() == "192.0.2.7"
+        assert sock_cls.call_count == 1
+        get_local_ip.cache_clear()
+
+    def test_falls_back_to_loopback(self):
+        get_local_ip.cache_clear()
+        with patch("socket.socket") as sock_cls:
+            sock_cls.return_value.connect.side_effect = OSError
+            assert get_local_ip() == "127.0.0.1"
+        get_local_ip.cache_clear()
+
+
+class TestPrintTraceback:
+
+    @pytest.fixture
+    def sink(self):
+        from cat_agent.log import logger
+
+        records = []
+        handler_id = logger.add(records.append, level="ERROR", format="{message}")
+        logger.enable("cat_agent")
+        yield records
+        logger.remove(handler_id)
+        logger.disable("cat_agent")
+
+    def test_emitted_traceback(self, sink):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            print_traceback()
+        assert "ValueError: boom" in sink[0]
+
+    def test_filtered_level_not_formatted(self, sink):
+        with patch("traceback.format_exception") as fmt:
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                print_traceback(is_error=False)
+        fmt.assert_not_called()
+        assert sink == []
+
 
 class TestHasChineseMessages:
 
@@ -69,6 +147,20 @@ class TestHasChineseMessages:
         msgs = [{"role": "assistant", "content": "你好"}]
         assert has_chinese_messages(msgs) is False
 
+    def test_list_content_checks_text_items_only(self):
+        msgs = [Message(role=USER, content=[ContentItem(file="/文件/a.pdf"), ContentItem(text="hello")])]
+        assert has_chinese_messages(msgs) is False
+        msgs.append(Message(role=USER, content=[ContentItem(text="你好")]))
+        assert has_chinese_messages(msgs) is True
+        assert has_chinese_messages([{"role": "user", "content": [{"text": "你好"}]}]) is True
+
+    def test_long_history_scanned_in_batches(self):
+        history = [{"role": "user", "content": "x" * 1000} for _ in range(20)]
+        assert has_chinese_messages(history) is False
+        assert has_chinese_messages(history[:7] + [{"role": "user", "content": "好"}] + history[7:]) is True
+        assert has_chinese_messages(history + [{"role": "system", "content": "好"}]) is True
+        assert has_chinese_messages(history + [{"role": "assistant", "content": "好"}]) is False
+
 
 class TestGetBasenameFromUrl:
 
@@ -81,6 +173,12 @@ class TestGetBasenameFromUrl:
     def test_local_unix_path(self):
         assert get_basename_from_url("/mnt/a/b/c") == "c"
 
+    def test_windows_path_and_repeat_calls_cached(self):
+        get_basename_from_url.cache_clear()
+        assert get_basename_from_url("C:\\Users\\me\\report.docx") == "report.docx"
+        assert get_basename_from_url("C:\\Users\\me\\report.docx") == "report.docx"
+        assert get_basename_from_url.cache_info().hits == 1
+
     def test_url_decoded(self):
         assert " " in get_basename_from_url("https://x.com/foo%20bar") or get_basename_from_url("https://x.com/foo%20bar") == "foo bar"
 
@@ -109,6 +207,10 @@ class TestIsImage:
     def test_non_image(self):
         assert is_image("https://x.com/doc.pdf") is False
 
+    def test_extension_needs_dot_and_ignores_case(self):
+        assert is_image("/tmp/PHOTO.JPG") is True
+        assert is_image("/tmp/notajpg") is False
+
 
 class TestExtractUrls:
 
@@ -157,6 +259,50 @@ class TestJsonLoads:
     def test_strips_whitespace(self):
         assert json_loads('  {"b": 2}  ') == {"b": 2}
 
+    def test_non_strict_json_falls_back_to_stdlib(self):
+        import math
+
+        assert math.isnan(json_loads('{"x": NaN}')["x"])
+        assert json_loads('{"big": 123456789012345678901234567890}') == {"big": 123456789012345678901234567890}
+
+
+class TestJsonDumpsCompact:
+
+    def test_pydantic_and_sort_keys(self):
+        from cat_agent.utils.json_utils import json_dumps_compact
+
+        msg = Message(role=USER, content="hé")
+        out = json_dumps_compact({"b": msg, "a": 1}, sort_keys=True)
+        assert out.index('"a"') < out.index('"b"')
+        assert "hé" in out
+        assert json_loads(out)["b"]["content"] == "hé"
+
+    def test_pretty_matches_stdlib_layout(self):
+        import json
+
+        from cat_agent.utils.json_utils import json_dumps_pretty
+
+        obj = {"a": [1, {"b": "ü"}], "c": {}, "d": []}
+        assert json_dumps_pretty(obj) == json.dumps(obj, ensure_ascii=False, indent=2)
+        assert json_dumps_pretty(obj, indent=4) == json.dumps(obj, ensure_ascii=False, indent=4)
+        floats = {"a": float("nan"), "b": [1e16, 1e-7, float("-inf")], "c": {"d": 0.5}}
+        assert json_dumps_pretty(floats) == json.dumps(floats, ensure_ascii=False, indent=2)
+        assert json_loads(json_dumps_pretty({"m": Message(role=USER, content="x")}))["m"]["content"] == "x"
+
+    def test_compact_matches_stdlib_bytes(self):
+        import json
+
+        from cat_agent.utils.json_utils import json_dumps_compact
+
+        obj = {"b": [1, 2.5, None, True], "a": {"ü": "x"}, "nan": float("nan"), "inf": float("inf")}
+        assert json_dumps_compact(obj) == json.dumps(obj, ensure_ascii=False)
+        assert json_dumps_compact(obj, sort_keys=True) == json.dumps(obj, ensure_ascii=False, sort_keys=True)
+
+    def test_non_str_keys_fall_back(self):
+        from cat_agent.utils.json_utils import json_dumps_compact
+
+        assert json_loads(json_dumps_compact({1: "x"})) == {"1": "x"}
+
 
 class TestMergeGenerateCfgs:
 
@@ -177,6 +323,13 @@ class TestMergeGenerateCfgs:
         assert out["a"] == 1
         assert out["b"] == 3
 
+    def test_base_left_untouched(self):
+        base = {"stop": ["a"], "seed": 1}
+        out = merge_generate_cfgs(base, {"stop": ["b"]})
+        out["stop"].append("c")
+        out.pop("seed")
+        assert base == {"stop": ["a"], "seed": 1}
+
 
 class TestExtractTextFromMessage:
 
@@ -188,6 +341,70 @@ class TestExtractTextFromMessage:
         msg = Message(role=USER, content=[ContentItem(text="Hi")])
         assert extract_text_from_message(msg, add_upload_info=False) == "Hi"
 
+    def test_text_items_joined_in_order(self):
+        msg = Message(role=USER, content=[ContentItem(text="a"), ContentItem(image="/x.png"), ContentItem(text="b")])
+        assert extract_text_from_message(msg, add_upload_info=False) == "ab"
+
+    def test_upload_info_included_on_request(self):
+        msg = Message(role=USER, content=[ContentItem(text="read"), ContentItem(file="/docs/a.pdf")])
+        assert extract_text_from_message(msg, add_upload_info=True, lang="en") == "(Uploaded [file](a.pdf)) read"
+        assert extract_text_from_message(msg, add_upload_info=False) == "read"
+
+
+class TestFormatAsMultimodalMessage:
+
+    def test_upload_info_prepended_per_kind(self):
+        msg = Message(role=USER, content=[
+            ContentItem(text="look"),
+            ContentItem(file="/docs/a.pdf"),
+            ContentItem(image="/img/b.png"),
+            ContentItem(audio={"data": "/snd/c.wav"}),
+        ])
+        out = format_as_multimodal_message(msg, add_upload_info=True, add_multimodel_upload_info=True,
+                                           add_audio_upload_info=True, lang="en")
+        assert [item.get_type_and_value()[0] for item in out.content] == ["text", "text", "image", "audio"]
+        assert out.content[0].text == "(Uploaded [file](a.pdf) ![image](b.png) ![audio](c.wav)) "
+
+    def test_auto_lang_follows_text_items(self):
+        kwargs = dict(add_upload_info=True, add_multimodel_upload_info=False, add_audio_upload_info=False)
+        zh = Message(role=USER, content=[ContentItem(text="你好"), ContentItem(file="/a.pdf")])
+        assert format_as_multimodal_message(zh, **kwargs).content[0].text == "(Uploaded [file](a.pdf))"
+        en = Message(role=USER, content=[ContentItem(text="hi"), ContentItem(file="/文件.pdf")])
+        assert format_as_multimodal_message(en, **kwargs).content[0].text == "(Uploaded [file](文件.pdf)) "
+
+    def test_media_not_listed_without_flags(self):
+        msg = Message(role=USER, content=[ContentItem(image="/img/b.png")])
+        out = format_as_multimodal_message(msg, add_upload_info=True, add_multimodel_upload_info=False,
+                                           add_audio_upload_info=False)
+        assert [item.image for item in out.content] == ["/img/b.png"]
+
+
+class TestBuildTextCompletionPrompt:
+
+    def test_turns_joined_with_trailing_end_trimmed(self):
+        msgs = [Message(role=SYSTEM, content="S"), Message(role=USER, content="hi"), Message(role=ASSISTANT, content="yo")]
+        assert build_text_completion_prompt(msgs) == (
+            "<|im_start|>system\nS<|im_end|>\n<|im_start|>user\nhi<|im_end|>\n<|im_start|>assistant\nyo")
+
+    def test_tool_call_rendered_as_pretty_json(self):
+        from cat_agent.llm.schema import FunctionCall
+
+        call = Message(role=ASSISTANT, content="", function_call=FunctionCall(name="f", arguments='{"q": "你好", "n": 12345678901234567890}'))
+        prompt = build_text_completion_prompt([Message(role=USER, content="hi"), call], allow_special=True, default_system="")
+        assert prompt.endswith('<tool_call>\n{\n  "name": "f",\n  "arguments": {\n    "q": "你好",\n'
+                               '    "n": 12345678901234567890\n  }\n}\n</tool_call>')
+
+    def test_tool_call_with_invalid_arguments_kept_verbatim(self):
+        from cat_agent.llm.schema import FunctionCall
+
+        call = Message(role=ASSISTANT, content="", function_call=FunctionCall(name="f", arguments="{bad"))
+        prompt = build_text_completion_prompt([Message(role=USER, content="hi"), call], allow_special=True, default_system="")
+        assert prompt.endswith('<tool_call>\n{"name": "f", "arguments": {bad}\n</tool_call>')
+
+    def test_no_system(self):
+        msgs = [Message(role=USER, content="hi")]
+        assert build_text_completion_prompt(msgs, default_system="") == "<|im_start|>user\nhi<|im_end|>\n<|im_start|>assistant\n"
+
 
 class TestExtractFilesFromMessages:
 
@@ -203,6 +420,14 @@ class TestExtractFilesFromMessages:
         assert extract_files_from_messages([msg], include_images=True) == ["https://img.png"]
         assert extract_files_from_messages([msg], include_images=False) == []
 
+    def test_duplicates_dropped_in_first_seen_order(self):
+        msgs = [
+            Message(role=USER, content=[ContentItem(file="/b.pdf"), ContentItem(image="/a.png")]),
+            Message(role=USER, content=[ContentItem(file="/a.png"), ContentItem(file="/b.pdf")]),
+        ]
+        assert extract_files_from_messages(msgs, include_images=True) == ["/b.pdf", "/a.png"]
+        assert extract_images_from_messages(msgs + msgs) == ["/a.png"]
+
 
 class TestExtractImagesFromMessages:
 
@@ -225,6 +450,14 @@ class TestGetLastUsrMsgIdx:
         msgs = [{"role": "user", "content": "hi"}]
         assert get_last_usr_msg_idx(msgs) == 0
 
+    def test_message_objects(self):
+        msgs = [Message(role=USER, content="a"), Message(role=USER, content="b"), Message(role=ASSISTANT, content="c")]
+        assert get_last_usr_msg_idx(msgs) == 1
+
+    def test_no_user_raises(self):
+        with pytest.raises(AssertionError):
+            get_last_usr_msg_idx([{"role": "assistant", "content": "x"}])
+
 
 class TestRmDefaultSystem:
 
@@ -263,9 +496,104 @@ class TestGetFileType:
         assert utils_module.get_file_type("file.docx") == "docx"
 
     def test_txt_via_mock_read(self):
-        with patch("cat_agent.utils.file_utils.read_text_from_file", return_value="<p>html</p>"):
+        with patch("cat_agent.utils.file_utils._sniff_head", return_value="<p>html</p>"):
             out = utils_module.get_file_type("/nonexistent/doc.txt")
             assert out == "html"
-        with patch("cat_agent.utils.file_utils.read_text_from_file", return_value="plain text"):
+        with patch("cat_agent.utils.file_utils._sniff_head", return_value="plain text"):
             out = utils_module.get_file_type("/nonexistent/doc.txt")
             assert out == "txt"
+
+    def test_only_file_head_is_read(self, tmp_path):
+        html = tmp_path / "page.txt"
+        html.write_bytes(b"<html><body>" + "é".encode() * 10_000)
+        big = tmp_path / "log.txt"
+        big.write_bytes(b"x" * 10_000 + b"<div>late</div>")
+        assert utils_module.get_file_type(str(html)) == "html"
+        assert utils_module.get_file_type(str(big)) == "txt"
+
+    def test_missing_local_file_is_unknown(self):
+        assert utils_module.get_file_type("/nonexistent/doc.txt") == "unk"
+
+
+class TestEncodeMediaAsBase64:
+
+    def test_streamed_encoding_matches_whole_file(self, tmp_path):
+        data = bytes(range(256)) * 700 + b"tail"  # Spans several chunks and ends unaligned
+        path = tmp_path / "clip.mp4"
+        path.write_bytes(data)
+        expected = "data:;base64," + base64.b64encode(data).decode()
+        assert media_utils.encode_video_as_base64(str(path)) == expected
+        assert media_utils.encode_audio_as_base64(str(path)) == expected
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.wav"
+        path.write_bytes(b"")
+        assert media_utils.encode_audio_as_base64(str(path)) == "data:;base64,"
+
+    def test_image_encoded_as_jpeg(self, tmp_path):
+        from io import BytesIO
+
+        Image = pytest.importorskip("PIL.Image")
+        path = tmp_path / "img.png"
+        Image.new("RGBA", (8, 4), (255, 0, 0, 255)).save(path)
+        out = media_utils.encode_image_as_base64(str(path))
+        assert out.startswith("data:image/jpeg;base64,")
+        decoded = Image.open(BytesIO(base64.b64decode(out.split(",", 1)[1])))
+        assert decoded.format == "JPEG" and decoded.size == (8, 4)
+
+    def test_transparent_pixels_flattened_onto_white(self, tmp_path):
+        from io import BytesIO
+
+        Image = pytest.importorskip("PIL.Image")
+        path = tmp_path / "clear.png"
+        Image.new("RGBA", (8, 8), (0, 0, 0, 0)).save(path)
+        out = media_utils.encode_image_as_base64(str(path))
+        decoded = Image.open(BytesIO(base64.b64decode(out.split(",", 1)[1])))
+        assert all(c > 250 for c in decoded.getpixel((4, 4)))
+
+    def test_large_jpeg_resized_to_short_side(self, tmp_path):
+        from io import BytesIO
+
+        Image = pytest.importorskip("PIL.Image")
+        path = tmp_path / "big.jpg"
+        Image.new("RGB", (1600, 1200), (0, 128, 255)).save(path)
+        out = media_utils.encode_image_as_base64(str(path), max_short_side_length=100)
+        decoded = Image.open(BytesIO(base64.b64decode(out.split(",", 1)[1])))
+        assert decoded.size == (133, 100)
+
+    def test_encode_many_keeps_order(self, tmp_path):
+        paths = []
+        for i in range(5):
+            path = tmp_path / f"clip{i}.wav"
+            path.write_bytes(bytes([i]) * (i + 1))
+            paths.append(str(path))
+        out = media_utils.encode_many(paths, encode=media_utils.encode_audio_as_base64)
+        assert out == [media_utils.encode_audio_as_base64(p) for p in paths]
+        assert media_utils.encode_many([]) == []
+
+
+class TestSaveUrlToLocalWorkDir:
+
+    def test_streams_download_through_shared_session(self, tmp_path):
+        from unittest.mock import MagicMock
+
+        from cat_agent.utils import file_utils
+
+        response = MagicMock(status_code=200)
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [b"ab", b"cd"]
+        with patch.object(file_utils._SESSION, "get", return_value=response) as mock_get:
+            path = file_utils.save_url_to_local_work_dir("https://example.com/a.txt", str(tmp_path))
+        assert mock_get.call_args.kwargs["stream"] is True
+        assert open(path, "rb").read() == b"abcd"
+
+    def test_bad_status_raises(self, tmp_path):
+        from unittest.mock import MagicMock
+
+        from cat_agent.utils import file_utils
+
+        response = MagicMock(status_code=404)
+        response.__enter__.return_value = response
+        with patch.object(file_utils._SESSION, "get", return_value=response):
+            with pytest.raises(ValueError, match="Can not download"):
+                file_utils.save_url_to_local_work_dir("https://example.com/a.txt", str(tmp_path))
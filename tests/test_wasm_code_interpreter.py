@@ -0,0 +1,64 @@
+"""Tests for cat_agent.tools.wasm_code_interpreter."""
+
+import pytest
+
+pytest.importorskip('wasmtime')
+
+from cat_agent.tools.wasm_code_interpreter import (  # noqa: E402
+    BUNDLED_RUNTIME_DIR,
+    WasmCodeInterpreter,
+    WasmPythonRuntime,
+)
+
+
+@pytest.fixture(scope='module')
+def runtime():
+    return WasmPythonRuntime(BUNDLED_RUNTIME_DIR)
+
+
+class TestWasmPythonRuntime:
+
+    def test_captures_stdout_and_stderr(self, runtime):
+        result = runtime.execute('import sys\nprint("héllo")\nprint("oops", file=sys.stderr)')
+        assert result['stdout'] == 'héllo'
+        assert result['stderr'].endswith('oops')
+        assert result['error'] is None
+        assert result['fuel_consumed'] > 0
+
+    def test_exception_reported(self, runtime):
+        result = runtime.execute('1/0')
+        assert 'ZeroDivisionError' in result['stderr']
+        assert result['error']
+
+    def test_fuel_exhaustion(self, runtime):
+        result = runtime.execute('while True: pass', fuel=5_000_000)
+        assert result['error'].startswith('Timeout')
+
+    def test_runs_isolated_with_shared_linker(self, runtime):
+        runtime.execute('import builtins\nbuiltins.leaked = 1')
+        linker = runtime._linker
+        result = runtime.execute('import builtins\nprint(hasattr(builtins, "leaked"))')
+        assert result['stdout'] == 'False'
+        assert runtime._linker is linker
+
+
+class TestWasmCodeInterpreter:
+
+    def test_call_with_json_args(self):
+        tool = WasmCodeInterpreter()
+        assert 'stdout:\n\n```\n42\n```' in tool.call('{"code": "print(6 * 7)"}')
+
+    def test_call_with_fenced_code(self):
+        tool = WasmCodeInterpreter()
+        assert 'stdout:\n\n```\n3\n```' in tool.call('```py\nprint(1 + 2)\n```')
+
+    def test_preload_loads_module_at_init(self):
+        assert WasmCodeInterpreter()._runtime is None
+        tool = WasmCodeInterpreter({'preload': True})
+        assert tool._runtime._module is not None
+
+    def test_empty_code(self):
+        assert WasmCodeInterpreter().call('{"code": "  "}') == ''
+
+    def test_format_result_empty(self):
+        assert WasmCodeInterpreter._format_result({}) == 'Finished execution.'